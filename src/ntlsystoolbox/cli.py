@@ -646,6 +646,13 @@ def _build_parser() -> argparse.ArgumentParser:
           ntl-systoolbox diagnostic --config config/config.yml
           ntl-systoolbox backup-wms --non-interactive --config config/config.yml
           ntl-systoolbox audit-obsolescence scan-range --cidr 192.168.10.0/24
+          ntl-systoolbox audit-obsolescence scan-range --all-sites --engine asyncio
+          ntl-systoolbox audit-obsolescence scan-range --cidr wh1 --banners
+          ntl-systoolbox audit-obsolescence scan-range --all-sites --agents 0.0.0.0:7070
+          ntl-systoolbox scan-agent --controller 192.168.10.5:7070 --sites wh1
+          ntl-systoolbox audit-obsolescence csv-report --csv inputs/components.csv --eol-policy offline
+          ntl-systoolbox eol-snapshot build --out eol_snapshot.bin
+          ntl-systoolbox audit-obsolescence csv-report --csv inputs/components.csv --eol-snapshot eol_snapshot.bin
         """
     ).strip()
 
@@ -674,15 +681,56 @@ def _build_parser() -> argparse.ArgumentParser:
 
     obs_sub.add_parser("interactive", help="Menu interactif du module")
     scan = obs_sub.add_parser("scan-range", help="Scan CIDR (non-interactif)")
-    scan.add_argument("--cidr", required=True)
+    where = scan.add_mutually_exclusive_group(required=True)
+    where.add_argument("--cidr", help="CIDR, liste 'cidr1,cidr2' ou noms de sites (siege,wh1,...)")
+    where.add_argument("--all-sites", action="store_true", help="Tous les sites de la section 'networks' (un seul job)")
+    where.add_argument("--resume", default=None, help="Reprend un scan interrompu depuis son checkpoint (scan_*.checkpoint.json)")
+    scan.add_argument("--engine", choices=("threads", "asyncio"), default=None, help="Moteur de scan (défaut: NTL_SCAN_ENGINE ou threads)")
+    scan.add_argument("--discovery", action="store_true", default=None, help="Pré-passe de liveness (1 sonde/adresse + table ARP) avant le scan complet")
+    scan.add_argument("--stream", action="store_true", default=None, help="Écrit l'inventaire en NDJSON au fil du scan (inventory_*.ndjson)")
+    scan.add_argument("--since", default=None, help="Inventaire précédent (inventory_*.json/.ndjson) : re-scan différentiel + delta")
+    scan.add_argument("--adaptive-timeout", dest="adaptive", action="store_true", default=None, help="Timeout par sous-réseau dérivé des RTT mesurés (p99 x k)")
+    scan.add_argument("--rate", type=float, default=None, help="Débit max global en sondes/s (défaut: NTL_SCAN_RATE, 0 = illimité)")
+    scan.add_argument("--site-rate", type=float, default=None, help="Débit max par sous-réseau cible en sondes/s (NTL_SCAN_SITE_RATE)")
+    scan.add_argument("--rotate", type=int, default=None, help="Avec --since : ne balaie qu'1 adresse inconnue sur N (tranche tournante par jour)")
+    scan.add_argument("--banners", action="store_true", default=None, help="Lit les bannières SSH/MySQL/HTTP(S) et en déduit le statut EOL (sans CSV)")
+    scan.add_argument("--shards", type=int, default=None, help="Découpe la plage en N tranches scannées par N processus (NTL_SCAN_SHARDS)")
+    scan.add_argument("--profile", default=None, help="Profil de ports : fast, default, deep ou profil de audit.scan_profiles")
+    scan.add_argument("--agents", default=None, help="Scan distribué : adresse d'écoute hôte:port pour les agents scan-agent (protocole en clair ; définir NTL_SCAN_AGENT_TOKEN des deux côtés)")
+    scan.add_argument("--jobs", type=int, default=None, help="Avec --agents : nombre de tranches par site à distribuer (NTL_SCAN_AGENT_JOBS)")
+    scan.add_argument("--refresh", action="store_true", default=None, help="Ignore le cache des hôtes (reports/audit/scan_cache.json) et re-sonde tout")
+    scan.add_argument("--eol-snapshot", default=None, help="Snapshot EOL (eol-snapshot build) utilisé avant le réseau, pour les sites isolés")
+    scan.add_argument("--eol-policy", choices=("default", "swr", "offline"), default=None, help="Politique du cache EOL: default, swr (périmé servi + rafraîchi en fond), offline (jamais de réseau)")
 
     le = obs_sub.add_parser("list-eol", help="Lister EOL d'un produit")
     le.add_argument("--product", required=True)
+    le.add_argument("--eol-snapshot", default=None, help="Snapshot EOL (eol-snapshot build) utilisé avant le réseau, pour les sites isolés")
+    le.add_argument("--eol-policy", choices=("default", "swr", "offline"), default=None, help="Politique du cache EOL: default, swr (périmé servi + rafraîchi en fond), offline (jamais de réseau)")
 
     cr = obs_sub.add_parser("csv-report", help="CSV composants -> rapport (option scan)")
     cr.add_argument("--csv", required=True)
     cr.add_argument("--scan", action="store_true")
     cr.add_argument("--cidr", default="")
+    cr.add_argument("--engine", choices=("threads", "asyncio"), default=None, help="Moteur de scan (si --scan)")
+    cr.add_argument("--discovery", action="store_true", default=None, help="Pré-passe de liveness (si --scan)")
+    cr.add_argument("--banners", action="store_true", default=None, help="Ajoute au CSV les services identifiés par bannière (si --scan)")
+    cr.add_argument("--profile", default=None, help="Profil de ports (si --scan)")
+    cr.add_argument("--refresh", action="store_true", default=None, help="Ignore le cache des hôtes et re-sonde tout (si --scan)")
+    cr.add_argument("--eol-snapshot", default=None, help="Snapshot EOL (eol-snapshot build) utilisé avant le réseau, pour les sites isolés")
+    cr.add_argument("--eol-policy", choices=("default", "swr", "offline"), default=None, help="Politique du cache EOL: default, swr (périmé servi + rafraîchi en fond), offline (jamais de réseau)")
+
+    snap = sub.add_parser("eol-snapshot", help="Snapshot EOL hors ligne (sites sans accès internet)")
+    snap_sub = snap.add_subparsers(dest="snapshot_action", required=True)
+    build = snap_sub.add_parser("build", help="Récupère les produits en parallèle et écrit un snapshot indexé")
+    build.add_argument("--out", default="reports/audit/eol_snapshot.bin", help="Fichier snapshot produit")
+    build.add_argument("--csv", default=None, help="CSV composants dont on prend les produits (défaut: audit.components_csv)")
+    build.add_argument("--products", default=None, help="Produits supplémentaires 'p1,p2'")
+    build.add_argument("--all", dest="all_products", action="store_true", help="Tout le catalogue endoflife.date")
+
+    agent = sub.add_parser("scan-agent", help="Agent de scan distribué (se connecte à un scan-range --agents ; jeton NTL_SCAN_AGENT_TOKEN)")
+    agent.add_argument("--controller", default=None, help="Contrôleur hôte:port (défaut: NTL_SCAN_CONTROLLER)")
+    agent.add_argument("--name", default=None, help="Nom de l'agent (défaut: nom d'hôte)")
+    agent.add_argument("--sites", default=None, help="Sites desservis, ex: wh1,wh2 : seules leurs tranches sont confiées à l'agent (défaut: NTL_SCAN_AGENT_SITES, sinon tous)")
 
     return p
 
@@ -715,5 +763,32 @@ def main(argv: Optional[list[str]] = None) -> int:
             res = _run_backup(cfg)
             return _handle_result(res, json_only=ns.json_only, quiet=ns.quiet, verbose=ns.verbose)
 
+        if ns.cmd == "scan-agent":
+            res = _run_obso_action(cfg, "scan_agent", controller=ns.controller, name=ns.name, sites=ns.sites)
+            return _handle_result(res, json_only=ns.json_only, quiet=ns.quiet, verbose=ns.verbose)
+
+        if ns.cmd == "eol-snapshot":
+            products = [x for x in (ns.products or "").split(",") if x.strip()]
+            res = _run_obso_action(cfg, "eol_snapshot_build", out=ns.out, csv_path=ns.csv, products=products, all_products=ns.all_products)
+            return _handle_result(res, json_only=ns.json_only, quiet=ns.quiet, verbose=ns.verbose)
+
         if ns.cmd == "audit-obsolescence":
-            action = ns.action or "interactive
+            action = ns.action or "interactive"
+            if action == "interactive":
+                res = _run_obso(cfg)
+            elif action == "scan-range":
+                cidr = "all" if ns.all_sites else ns.cidr
+                res = _run_obso_action(cfg, "scan_range", cidr=cidr, engine=ns.engine, discovery=ns.discovery, stream=ns.stream, since=ns.since, rotate=ns.rotate, adaptive=ns.adaptive, rate=ns.rate, site_rate=ns.site_rate, banners=ns.banners, resume=ns.resume, shards=ns.shards, profile=ns.profile, agents=ns.agents, jobs=ns.jobs, refresh=ns.refresh, eol_policy=ns.eol_policy, eol_snapshot=ns.eol_snapshot)
+            elif action == "list-eol":
+                res = _run_obso_action(cfg, "list_versions_eol", product=ns.product, eol_policy=ns.eol_policy, eol_snapshot=ns.eol_snapshot)
+            elif action == "csv-report":
+                res = _run_obso_action(cfg, "csv_to_report", csv_path=ns.csv, do_scan=bool(ns.scan), cidr=ns.cidr, engine=ns.engine, discovery=ns.discovery, banners=ns.banners, profile=ns.profile, refresh=ns.refresh, eol_policy=ns.eol_policy, eol_snapshot=ns.eol_snapshot)
+            else:
+                parser.error(f"action inconnue: {action}")
+            return _handle_result(res, json_only=ns.json_only, quiet=ns.quiet, verbose=ns.verbose)
+
+        parser.error(f"commande inconnue: {ns.cmd}")
+    except KeyboardInterrupt:
+        print(_UI.yellow("\nInterrompu."))
+        return 130
+    return 0
@@ -1,20 +1,66 @@
 # src/ntlsystoolbox/modules/audit_obsolescence.py
 from __future__ import annotations
 
+import asyncio
 import csv
 import ipaddress
 import json
+import mmap
 import os
+import re
 import socket
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass
+from itertools import chain, islice
 from datetime import datetime, date
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from ntlsystoolbox.core.result import ModuleResult
+from ntlsystoolbox.modules.scan_agents import AGENT_OPTION_KEYS, _AgentController, _agent_config, _run_scan_agent
+from ntlsystoolbox.modules.scan_engine import (
+    _BANNER_PRODUCTS,
+    _AdaptiveTimeout,
+    _AliveCollector,
+    _BlockTracker,
+    _Checkpoint,
+    _CompactInventory,
+    _HostCollector,
+    _Lane,
+    _NdjsonSink,
+    _RateGovernor,
+    _ScanCache,
+    _diff_pairs,
+    _ensure_dir,
+    _fd_budget,
+    _grab_banner,
+    _host_port_pairs,
+    _inventory_delta,
+    _ip_int,
+    _ip_sort_key,
+    _iter_hosts,
+    _load_checkpoint,
+    _load_inventory,
+    _paced_connect,
+    _product_from_banner,
+    _read_arp_table,
+    _read_ndjson,
+    _tcp_connect_async,
+)
+
+try:
+    import numpy as np  # optionnel : calcul vectorisé des statuts EOL
+except Exception:
+    np = None  # type: ignore
 
 
 # ----------------------------
@@ -25,16 +71,19 @@ def _env(key: str, default: Optional[str] = None) -> Optional[str]:
     return v if v not in (None, "") else default
 
 
+def _env_flag(key: str, default: bool = False) -> bool:
+    v = _env(key)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "y", "on")
+
+
 def _prompt(msg: str, default: Optional[str] = None) -> str:
     suffix = f" [{default}]" if default else ""
     v = input(f"{msg}{suffix} : ").strip()
     return v if v else (default or "")
 
 
-def _ensure_dir(path: str) -> None:
-    Path(path).mkdir(parents=True, exist_ok=True)
-
-
 def _parse_date(d: Any) -> Optional[date]:
     """
     endoflife.date peut renvoyer:
@@ -53,26 +102,15 @@ def _parse_date(d: Any) -> Optional[date]:
     return None
 
 
-def _tcp_ports(host: str, ports: List[int], timeout_s: float = 0.5) -> List[int]:
-    open_ports: List[int] = []
-    for p in ports:
-        try:
-            with socket.create_connection((host, p), timeout=timeout_s):
-                open_ports.append(p)
-        except Exception:
-            pass
-    return open_ports
-
 
-def _guess_os_from_ports(open_ports: List[int]) -> str:
-    # Heuristique simple (demande: "essayer de déterminer l’OS")
-    if any(p in open_ports for p in (3389, 445, 139)):
-        return "windows"
-    if any(p in open_ports for p in (53, 389)):
-        return "windows-server (dc/dns probable)"
-    if 22 in open_ports:
-        return "linux"
-    return "unknown"
+def _components_from_inventory(inventory: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Services identifiés par bannière -> composants au format du CSV (name/product/version)."""
+    return [
+        {"name": f"{h['ip']}:{svc['port']}", "product": svc["product"], "version": svc["version"]}
+        for h in inventory
+        for svc in h.get("services") or []
+        if svc.get("product")
+    ]
 
 
 def _status_from_eol(today: date, eol: Any, soon_days: int) -> Tuple[str, Optional[str]]:
@@ -97,6 +135,97 @@ def _status_from_eol(today: date, eol: Any, soon_days: int) -> Tuple[str, Option
     return "UNKNOWN", None
 
 
+# Calcul par lot : numéros de jour (date.toordinal), sentinelles pour true/false/inconnu
+_DAY_UNKNOWN = -1
+_DAY_NEVER = 2**62
+_STATUS_BY_CODE = ("UNKNOWN", "EOL", "SOON", "OK")
+EOL_HORIZONS = (30, 90, 180, 365)
+
+
+def _eol_days(eols: Iterable[Any]) -> Tuple[array, List[Optional[str]]]:
+    """
+    Convertit une fois des valeurs `eol` en numéros de jour + date affichée
+    (mêmes règles que _status_from_eol) : true -> 0 (toujours EOL),
+    false -> _DAY_NEVER, absent / illisible -> _DAY_UNKNOWN. Chaque chaîne
+    distincte n'est analysée qu'une fois.
+    """
+    days = array("q")
+    shown: List[Optional[str]] = []
+    parsed: Dict[str, Tuple[int, Optional[str]]] = {}
+    for e in eols:
+        if isinstance(e, bool):
+            day, txt = (0 if e else _DAY_NEVER), None
+        elif isinstance(e, str):
+            if e not in parsed:
+                d = _parse_date(e)
+                parsed[e] = (d.toordinal(), d.isoformat()) if d else (_DAY_UNKNOWN, e)
+            day, txt = parsed[e]
+        else:
+            day, txt = _DAY_UNKNOWN, None
+        days.append(day)
+        shown.append(txt)
+    return days, shown
+
+
+def _eol_statuses(today: date, days: array, soon_days: int) -> List[str]:
+    """Statuts OK/SOON/EOL/UNKNOWN de tout le lot en une passe (NumPy si disponible)."""
+    t = today.toordinal()
+    if np is not None:
+        d = np.frombuffer(days, dtype=np.int64)
+        codes = np.select([d == _DAY_UNKNOWN, d < t, d - t <= soon_days], [0, 1, 2], default=3)
+        return [_STATUS_BY_CODE[c] for c in codes.tolist()]
+    return ["UNKNOWN" if d == _DAY_UNKNOWN else "EOL" if d < t else "SOON" if d - t <= soon_days else "OK" for d in days]
+
+
+def _eol_horizons(today: date, days: array, weights: array, horizons: Iterable[int] = EOL_HORIZONS) -> Dict[int, int]:
+    """Nombre de composants (pondéré par `weights`) hors support à J+h, EOL déjà passés compris."""
+    t = today.toordinal()
+    if np is not None:
+        d = np.frombuffer(days, dtype=np.int64)
+        w = np.frombuffer(weights, dtype=np.int64)
+        known = d != _DAY_UNKNOWN
+        return {h: int(w[known & (d < t + h)].sum()) for h in horizons}
+    return {h: sum(w for d, w in zip(days, weights) if d != _DAY_UNKNOWN and d < t + h) for h in horizons}
+
+
+_VERSION_SEP = re.compile(r"[.\s]+")
+
+
+class _CycleIndex:
+    """
+    Index des cycles d'un produit (lignes de _list_versions_eol) : trie sur les
+    segments de version ("22.04 LTS" -> 22 / 04 / LTS). `match` rend le cycle
+    le plus long préfixe de la version, en O(nb segments) et indépendamment de
+    l'ordre des lignes ("1" ne masque plus "10", "1.2" l'emporte sur "1").
+    Les résultats sont mémorisés par version.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self._root: Dict[str, Any] = {}
+        self._memo: Dict[str, Optional[Dict[str, Any]]] = {}
+        for r in rows:
+            c = str(r.get("cycle", "")).strip()
+            if not c:
+                continue
+            node = self._root
+            for seg in _VERSION_SEP.split(c):
+                node = node.setdefault(seg, {})
+            node.setdefault("", r)  # "" = cycle terminé ici ; à cycle égal, la 1re ligne gagne
+
+    def match(self, version: str) -> Optional[Dict[str, Any]]:
+        v = version.strip()
+        if v in self._memo:
+            return self._memo[v]
+        node, best = self._root, None
+        for seg in _VERSION_SEP.split(v) if v else []:
+            node = node.get(seg)
+            if node is None:
+                break
+            best = node.get("", best)
+        self._memo[v] = best
+        return best
+
+
 # ----------------------------
 # EOL Provider (endoflife.date)
 # ----------------------------
@@ -105,6 +234,231 @@ class EOLMeta:
     source: str
     fetched_at_iso: str
     api_mode: str  # "v1" or "v0"
+    cache: str = ""  # "hit" (cache local), "miss" (récupéré), "revalidated" (304), "stale" (périmé servi), "snapshot" ou "absent"
+    fetch_ms: Optional[float] = None
+    age_s: Optional[float] = None  # âge des données servies (depuis fetched_at_iso)
+
+
+EOL_POLICIES = ("default", "swr", "offline")
+
+
+def _fmt_age(age_s: Optional[float]) -> str:
+    if age_s is None:
+        return "inconnu"
+    if age_s < 60:
+        return "< 1 min"
+    if age_s < 3600:
+        return f"{int(age_s // 60)} min"
+    if age_s < 86400:
+        return f"{int(age_s // 3600)} h"
+    return f"{int(age_s // 86400)} j"
+
+
+class _EOLStore:
+    """
+    Cache EOL par produit dans SQLite (une ligne par produit) :
+    - chargement paresseux : seul le produit demandé est lu, plus de gros JSON
+      relu / réécrit en entier à chaque mise à jour ;
+    - verrouillage inter-processus assuré par SQLite (WAL + attente sur verrou),
+      une connexion par opération donc utilisable depuis plusieurs threads ;
+    - taille bornée (`max_bytes`) : éviction des produits les moins récemment lus.
+    Un ancien eol_cache.json voisin est importé à la création de la base puis
+    renommé en .json.migrated.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 8 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    def _exists(self) -> bool:
+        return os.path.exists(self.path) or Path(self.path).with_suffix(".json").exists()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    self._init(conn)
+                    self._ready = True
+        return conn
+
+    def _init(self, conn: sqlite3.Connection) -> None:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                "product TEXT PRIMARY KEY, entry TEXT NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+            )
+        legacy = Path(self.path).with_suffix(".json")
+        if legacy.exists():
+            try:
+                with open(legacy, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                now = time.time()
+                with conn:
+                    for product, entry in (data.items() if isinstance(data, dict) else []):
+                        if isinstance(entry, dict):
+                            raw = json.dumps(entry, ensure_ascii=False)
+                            conn.execute(
+                                "INSERT OR IGNORE INTO products VALUES (?, ?, ?, ?)", (product, raw, len(raw), now)
+                            )
+                os.replace(legacy, str(legacy) + ".migrated")
+            except Exception:
+                pass
+
+    def get(self, product: str) -> Optional[Dict[str, Any]]:
+        try:
+            if not self._exists():
+                return None
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT entry FROM products WHERE product = ?", (product,)).fetchone()
+                if row is None:
+                    return None
+                with conn:
+                    conn.execute("UPDATE products SET accessed_at = ? WHERE product = ?", (time.time(), product))
+                entry = json.loads(row[0])
+                return entry if isinstance(entry, dict) else None
+            finally:
+                conn.close()
+        except Exception:
+            return None
+
+    def put(self, product: str, entry: Dict[str, Any]) -> None:
+        try:
+            _ensure_dir(str(Path(self.path).parent))
+            raw = json.dumps(entry, ensure_ascii=False)
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)", (product, raw, len(raw), time.time()))
+                    self._evict(conn, keep=product)
+            finally:
+                conn.close()
+        except Exception:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection, keep: str) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM products").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for product, size in conn.execute(
+            "SELECT product, size FROM products WHERE product != ? ORDER BY accessed_at", (keep,)
+        ).fetchall():
+            conn.execute("DELETE FROM products WHERE product = ?", (product,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def products(self) -> List[str]:
+        try:
+            if not self._exists():
+                return []
+            conn = self._connect()
+            try:
+                return [r[0] for r in conn.execute("SELECT product FROM products ORDER BY product")]
+            finally:
+                conn.close()
+        except Exception:
+            return []
+
+
+# Snapshot EOL (sites isolés) :
+#   en-tête  : magic | nb produits (u32) | nb slots (u32, puissance de 2) | date de build (epoch)
+#   index    : nb slots x (crc32 du nom u32, offset u32, longueur u32), adressage ouvert linéaire
+#   données  : par produit, zlib(JSON compact {"product": ..., "entry": {...}})
+_SNAP_MAGIC = b"NTLEOLS1"
+_SNAP_HEADER = struct.Struct("<8sIId")
+_SNAP_SLOT = struct.Struct("<III")
+
+
+def _write_eol_snapshot(path: str, entries: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Écrit un snapshot indexé (écriture atomique : .tmp puis os.replace)."""
+    nslots = 8
+    while nslots < 2 * len(entries):
+        nslots *= 2
+    slots = [(0, 0, 0)] * nslots
+    blobs: List[bytes] = []
+    offset = _SNAP_HEADER.size + nslots * _SNAP_SLOT.size
+    for product in sorted(entries):
+        raw = json.dumps({"product": product, "entry": entries[product]}, ensure_ascii=False, separators=(",", ":"))
+        blob = zlib.compress(raw.encode("utf-8"), 9)
+        h = zlib.crc32(product.encode("utf-8"))
+        i = h & (nslots - 1)
+        while slots[i][2]:
+            i = (i + 1) & (nslots - 1)
+        slots[i] = (h, offset, len(blob))
+        blobs.append(blob)
+        offset += len(blob)
+
+    _ensure_dir(str(Path(path).parent))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_SNAP_HEADER.pack(_SNAP_MAGIC, len(entries), nslots, time.time()))
+        for slot in slots:
+            f.write(_SNAP_SLOT.pack(*slot))
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+    return {"path": path, "products": len(entries), "bytes": offset}
+
+
+class _EOLSnapshot:
+    """
+    Lecture d'un snapshot EOL par mmap : seul l'en-tête est lu à l'ouverture,
+    chaque recherche coûte un hachage + un slot (O(1)) et ne décompresse que
+    l'enregistrement du produit demandé. Lecture seule, partageable entre threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"Snapshot EOL vide: {path}")
+        try:
+            magic, self.count, self.nslots, self.built_at = _SNAP_HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            magic = b""
+        if magic != _SNAP_MAGIC or not self.nslots or self.nslots & (self.nslots - 1):
+            self._mm.close()
+            raise ValueError(f"Snapshot EOL invalide: {path}")
+
+    def _slot(self, i: int) -> Tuple[int, int, int]:
+        return _SNAP_SLOT.unpack_from(self._mm, _SNAP_HEADER.size + i * _SNAP_SLOT.size)
+
+    def _record(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(self._mm[offset : offset + length]).decode("utf-8"))
+
+    def get(self, product: str) -> Optional[Dict[str, Any]]:
+        h = zlib.crc32(product.encode("utf-8"))
+        mask = self.nslots - 1
+        i = h & mask
+        for _ in range(self.nslots):
+            sh, offset, length = self._slot(i)
+            if not length:
+                return None
+            if sh == h:
+                rec = self._record(offset, length)
+                if rec.get("product") == product:
+                    entry = rec.get("entry")
+                    return entry if isinstance(entry, dict) else None
+            i = (i + 1) & mask
+        return None
+
+    def products(self) -> List[str]:
+        out = []
+        for i in range(self.nslots):
+            _, offset, length = self._slot(i)
+            if length:
+                out.append(self._record(offset, length).get("product", ""))
+        return sorted(out)
+
+    def close(self) -> None:
+        self._mm.close()
 
 
 class EOLProvider:
@@ -112,30 +466,113 @@ class EOLProvider:
     Récupère les cycles + EOL via endoflife.date.
     - tente v1: https://endoflife.date/api/v1/products/{product}/
     - fallback v0: https://endoflife.date/api/{product}.json
-    Cache local: reports/audit/eol_cache.json
+    Cache local: reports/audit/eol_cache.sqlite (voir _EOLStore)
+    Une seule requests.Session (connexions keep-alive réutilisées, pool dimensionné
+    sur NTL_EOL_WORKERS). Une entrée expirée est revalidée par requête
+    conditionnelle (If-None-Match / If-Modified-Since avec l'ETag / Last-Modified
+    stockés) : un 304 prolonge simplement sa validité.
+    Politique (`policy` / set_policy ; NTL_EOL_POLICY est résolue et validée par
+    run_action) pour une entrée expirée :
+    - "default" : revalidation / récupération synchrone ;
+    - "swr" (stale-while-revalidate) : l'entrée périmée est servie tout de suite
+      et rafraîchie en arrière-plan (thread daemon ; wait_refreshes borne
+      l'attente en fin de run_action, NTL_EOL_REFRESH_WAIT) ;
+    - "offline" : jamais de réseau ; données du cache quel que soit leur âge,
+      rien (UNKNOWN) pour un produit absent.
+    EOLMeta.age_s indique toujours l'âge des données servies.
+    Avec un snapshot (`load_snapshot`, --eol-snapshot), un produit absent du
+    cache valide est servi depuis le snapshot (cache="snapshot") avant toute
+    politique réseau.
     """
 
-    def __init__(self, cache_path: str = "reports/audit/eol_cache.json", ttl_hours: int = 24):
+    def __init__(
+        self,
+        cache_path: str = "reports/audit/eol_cache.sqlite",
+        ttl_hours: int = 24,
+        base_url: Optional[str] = None,
+        policy: Optional[str] = None,
+    ):
         self.cache_path = cache_path
         self.ttl_hours = ttl_hours
-        self._cache: Dict[str, Any] = self._load_cache()
-
-    def _load_cache(self) -> Dict[str, Any]:
+        self.policy = "default"
+        if policy:
+            self.set_policy(policy)
+        self._refreshing: Set[str] = set()
+        self._refresh_threads: List[threading.Thread] = []
+        self._refresh_lock = threading.Lock()
+        self.base_url = (base_url or _env("NTL_EOL_BASE_URL", "https://endoflife.date") or "").rstrip("/")
+        self.snapshot: Optional[_EOLSnapshot] = None
+        self.store = _EOLStore(cache_path, max_bytes=int(_env("NTL_EOL_CACHE_MAX_KB", "8192") or "8192") * 1024)
+        self.session = requests.Session()
+        pool = int(_env("NTL_EOL_WORKERS", "8") or "8")
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(1, pool))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = "ntl-systoolbox"
+
+    def _store(self, product: str, entry: Dict[str, Any]) -> None:
+        self.store.put(product, entry)
+
+    def set_policy(self, policy: Optional[str]) -> None:
+        policy = (policy or "default").strip().lower()
+        if policy not in EOL_POLICIES:
+            raise ValueError(f"Politique EOL inconnue: {policy} (attendu: {', '.join(EOL_POLICIES)})")
+        self.policy = policy
+
+    def load_snapshot(self, path: str) -> None:
+        self.snapshot = _EOLSnapshot(path)
+
+    def list_products(self) -> List[str]:
+        """Catalogue complet des produits endoflife.date (v1, fallback v0)."""
         try:
-            if os.path.exists(self.cache_path):
-                with open(self.cache_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
+            r = self.session.get(f"{self.base_url}/api/v1/products/", timeout=15)
+            if r.status_code == 200:
+                body = r.json()
+                names = [p.get("name") for p in (body.get("result") or []) if isinstance(p, dict)]
+                if names:
+                    return sorted({str(n).lower() for n in names if n})
         except Exception:
             pass
-        return {}
+        r = self.session.get(f"{self.base_url}/api/all.json", timeout=15)
+        r.raise_for_status()
+        return sorted({str(n).lower() for n in r.json() if n})
 
-    def _save_cache(self) -> None:
+    def _age_s(self, fetched_at_iso: str) -> Optional[float]:
         try:
-            _ensure_dir(str(Path(self.cache_path).parent))
-            with open(self.cache_path, "w", encoding="utf-8") as f:
-                json.dump(self._cache, f, indent=2, ensure_ascii=False)
+            return max(0.0, (datetime.now() - datetime.fromisoformat(fetched_at_iso)).total_seconds())
         except Exception:
-            pass
+            return None
+
+    def _refresh_async(self, product: str, stale: Dict[str, Any]) -> None:
+        with self._refresh_lock:
+            if product in self._refreshing:
+                return
+            self._refreshing.add(product)
+
+        def refresh() -> None:
+            try:
+                self._fetch(product, stale)
+            except Exception:
+                pass
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(product)
+
+        thread = threading.Thread(target=refresh, name=f"eol-swr-{product}", daemon=True)
+        with self._refresh_lock:
+            self._refresh_threads = [t for t in self._refresh_threads if t.is_alive()] + [thread]
+        thread.start()
+
+    def wait_refreshes(self, timeout_s: float) -> int:
+        """Attend les rafraîchissements swr en cours, au plus timeout_s au total ; renvoie le nombre abandonné."""
+        deadline = time.monotonic() + max(0.0, timeout_s)
+        with self._refresh_lock:
+            threads = list(self._refresh_threads)
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._refresh_lock:
+            self._refresh_threads = [t for t in self._refresh_threads if t.is_alive()]
+            return len(self._refresh_threads)
 
     def _cache_valid(self, fetched_at_iso: str) -> bool:
         try:
@@ -144,52 +581,198 @@ class EOLProvider:
         except Exception:
             return False
 
+    def _get(self, url: str, stale: Optional[Dict[str, Any]]) -> requests.Response:
+        # Requête conditionnelle si l'entrée expirée provient de cette URL
+        headers: Dict[str, str] = {}
+        if stale and stale.get("url") == url:
+            if stale.get("etag"):
+                headers["If-None-Match"] = stale["etag"]
+            if stale.get("last_modified"):
+                headers["If-Modified-Since"] = stale["last_modified"]
+        return self.session.get(url, headers=headers, timeout=8)
+
+    def _fresh(self, product: str, url: str, r: requests.Response, data: List[Any], api_mode: str, fetched_at_iso: str) -> EOLMeta:
+        meta = EOLMeta(source="endoflife.date", fetched_at_iso=fetched_at_iso, api_mode=api_mode, cache="miss", age_s=0.0)
+        entry = {"data": data, "fetched_at_iso": fetched_at_iso, "source": meta.source, "api_mode": api_mode, "url": url}
+        if r.headers.get("ETag"):
+            entry["etag"] = r.headers["ETag"]
+        if r.headers.get("Last-Modified"):
+            entry["last_modified"] = r.headers["Last-Modified"]
+        self._store(product, entry)
+        return meta
+
+    def _revalidated(self, product: str, stale: Dict[str, Any], fetched_at_iso: str) -> Tuple[List[Dict[str, Any]], EOLMeta]:
+        # 304 : données inchangées, on repart pour un TTL complet
+        self._store(product, {**stale, "fetched_at_iso": fetched_at_iso})
+        return stale.get("data", []), EOLMeta(
+            source=stale.get("source", "endoflife.date"),
+            fetched_at_iso=fetched_at_iso,
+            api_mode=stale.get("api_mode", "cache"),
+            cache="revalidated",
+            age_s=0.0,
+        )
+
     def fetch_product(self, product: str) -> Tuple[List[Dict[str, Any]], EOLMeta]:
         product = product.strip().lower()
 
         # Cache
-        cached = self._cache.get(product)
+        cached = self.store.get(product)
+        stale: Optional[Dict[str, Any]] = None
+        valid = bool(cached and isinstance(cached, dict) and self._cache_valid(cached.get("fetched_at_iso", "")))
+        snap = self.snapshot.get(product) if self.snapshot is not None and not valid else None
+        if snap is not None:
+            return snap.get("data", []), EOLMeta(
+                source=f"{snap.get('source', 'endoflife.date')} (snapshot {Path(self.snapshot.path).name})",
+                fetched_at_iso=snap.get("fetched_at_iso", ""),
+                api_mode=snap.get("api_mode", "snapshot"),
+                cache="snapshot",
+                age_s=self._age_s(snap.get("fetched_at_iso", "")),
+            )
         if cached and isinstance(cached, dict):
-            if self._cache_valid(cached.get("fetched_at_iso", "")):
+            if valid or self.policy in ("swr", "offline"):
+                if not valid and self.policy == "swr":
+                    self._refresh_async(product, cached)
                 return cached.get("data", []), EOLMeta(
                     source=cached.get("source", "endoflife.date"),
                     fetched_at_iso=cached.get("fetched_at_iso", ""),
                     api_mode=cached.get("api_mode", "cache"),
+                    cache="hit" if valid else "stale",
+                    age_s=self._age_s(cached.get("fetched_at_iso", "")),
                 )
+            stale = cached
+
+        if self.policy == "offline":
+            return [], EOLMeta(source="endoflife.date", fetched_at_iso="", api_mode="offline", cache="absent")
+        return self._fetch(product, stale)
 
+    def _fetch(self, product: str, stale: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], EOLMeta]:
         fetched_at_iso = datetime.now().isoformat(timespec="seconds")
 
         # Try v1
-        v1_url = f"https://endoflife.date/api/v1/products/{product}/"
+        v1_url = f"{self.base_url}/api/v1/products/{product}/"
         try:
-            r = requests.get(v1_url, timeout=8)
+            r = self._get(v1_url, stale)
+            if r.status_code == 304 and stale is not None:
+                return self._revalidated(product, stale, fetched_at_iso)
             if r.status_code == 200:
                 data = r.json()
                 if isinstance(data, list):
-                    meta = EOLMeta(source="endoflife.date", fetched_at_iso=fetched_at_iso, api_mode="v1")
-                    self._cache[product] = {"data": data, "fetched_at_iso": fetched_at_iso, "source": meta.source, "api_mode": meta.api_mode}
-                    self._save_cache()
-                    return data, meta
+                    return data, self._fresh(product, v1_url, r, data, "v1", fetched_at_iso)
         except Exception:
             pass
 
         # Fallback v0
-        v0_url = f"https://endoflife.date/api/{product}.json"
-        r = requests.get(v0_url, timeout=8)
+        v0_url = f"{self.base_url}/api/{product}.json"
+        r = self._get(v0_url, stale)
+        if r.status_code == 304 and stale is not None:
+            return self._revalidated(product, stale, fetched_at_iso)
         r.raise_for_status()
         data = r.json()
         if not isinstance(data, list):
             data = []
 
-        meta = EOLMeta(source="endoflife.date", fetched_at_iso=fetched_at_iso, api_mode="v0")
-        self._cache[product] = {"data": data, "fetched_at_iso": fetched_at_iso, "source": meta.source, "api_mode": meta.api_mode}
-        self._save_cache()
-        return data, meta
+        return data, self._fresh(product, v0_url, r, data, "v0", fetched_at_iso)
+
+
+# ----------------------------
+# Rapport HTML (pages + table virtualisée)
+# ----------------------------
+_REPORT_CSS = (
+    "body{font-family:Arial,Helvetica,sans-serif;margin:24px} table{border-collapse:collapse;width:100%}"
+    " td,th{border:1px solid #ddd;padding:8px} th{background:#f3f3f3} .ok{background:#e9ffe9}"
+    " .soon{background:#fff7d6} .eol{background:#ffe2e2} .unk{background:#f0f0f0}"
+    " #vt{height:70vh;overflow:auto;border:1px solid #ddd} #vt thead th{position:sticky;top:0}"
+    " #vt td{height:29px;padding:0 8px;white-space:nowrap;overflow:hidden} .pager a{margin-right:6px}"
+)
+# Lignes : [composant, produit, version, eol, code statut (_STATUS_BY_CODE)] ; seules
+# les lignes visibles (+ marge) sont dans le DOM, le reste est simulé par deux lignes vides.
+_REPORT_JS = """(function(){
+var S=["UNKNOWN","EOL","SOON","OK"],C=["unk","eol","soon","ok"],H=30;
+var rows=JSON.parse(document.getElementById("rows").textContent),view=rows;
+var box=document.getElementById("vt"),body=document.getElementById("vt-body"),q=document.getElementById("vt-q");
+function esc(s){return String(s).replace(/&/g,"&amp;").replace(/</g,"&lt;").replace(/>/g,"&gt;");}
+function draw(){
+var first=Math.max(0,Math.floor(box.scrollTop/H)-10),last=Math.min(view.length,first+Math.ceil(box.clientHeight/H)+20),h=[];
+h.push('<tr style="height:'+first*H+'px"></tr>');
+for(var i=first;i<last;i++){var r=view[i];h.push('<tr class="'+C[r[4]]+'"><td>'+esc(r[0])+"</td><td>"+esc(r[1])+"</td><td>"+esc(r[2])+"</td><td>"+esc(r[3]||"")+"</td><td><b>"+S[r[4]]+"</b></td></tr>");}
+h.push('<tr style="height:'+(view.length-last)*H+'px"></tr>');
+body.innerHTML=h.join("");}
+q.oninput=function(){var t=q.value.toLowerCase();view=t?rows.filter(function(r){return (r[0]+" "+r[1]+" "+r[2]+" "+S[r[4]]).toLowerCase().indexOf(t)>=0;}):rows;box.scrollTop=0;draw();};
+box.onscroll=draw;draw();
+})();"""
+
+
+def _esc(s: Any) -> str:
+    return str(s).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _report_head(title: str) -> str:
+    return f"<!doctype html><html><head><meta charset='utf-8'><title>{_esc(title)}</title><style>{_REPORT_CSS}</style></head><body>"
+
+
+def _report_table(rows: List[List[Any]], pager: str) -> str:
+    data = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    return (
+        f"<p class='pager'>{pager}</p>"
+        f"<p><input id='vt-q' placeholder='Filtrer (composant, produit, version, statut)' size='48'> {len(rows)} composant(s) sur cette page</p>"
+        "<div id='vt'><table><thead><tr><th>Composant</th><th>Produit/OS</th><th>Version</th><th>EOL</th><th>Statut</th></tr></thead>"
+        "<tbody id='vt-body'></tbody></table></div>"
+        f"<script type='application/json' id='rows'>{data}</script><script>{_REPORT_JS}</script>"
+    )
 
 
 # ----------------------------
 # Module
 # ----------------------------
+SCAN_PORTS = (22, 53, 80, 443, 389, 445, 3389, 3306)
+SCAN_ENGINES = ("threads", "asyncio")
+ALL_SITES = "all"
+# Options de scan transmises par run_action() -> _scan_range() (si renseignées)
+SCAN_OPTION_KEYS = ("engine", "discovery", "since", "rotate", "adaptive", "rate", "site_rate", "banners", "shards", "profile", "agents", "jobs", "refresh")
+# Ports dont on lit la bannière (étape --banners) -> protocole de lecture
+BANNER_PORTS = {22: "ssh", 3306: "mysql", 80: "http", 443: "https"}
+
+# Top 100 des ports TCP (fréquences nmap-services), pour les audits trimestriels
+TOP_100_PORTS = (
+    7, 9, 13, 21, 22, 23, 25, 26, 37, 53, 79, 80, 81, 88, 106, 110, 111, 113, 119, 135,
+    139, 143, 144, 179, 199, 389, 427, 443, 444, 445, 465, 513, 514, 515, 543, 544, 548, 554, 587, 631,
+    646, 873, 990, 993, 995, 1025, 1026, 1027, 1028, 1029, 1110, 1433, 1720, 1723, 1755, 1900, 2000, 2001, 2049, 2121,
+    2717, 3000, 3128, 3306, 3389, 3986, 4899, 5000, 5009, 5051, 5060, 5101, 5190, 5357, 5432, 5631, 5666, 5800, 5900, 6000,
+    6001, 6646, 7070, 8000, 8008, 8009, 8080, 8081, 8443, 8888, 9100, 9999, 10000, 32768, 49152, 49153, 49154, 49155, 49156, 49157,
+)
+# Profils intégrés ; "ports": None = SCAN_PORTS. Surchargeables dans audit.scan_profiles :
+#   <nom>: {ports: [22, {port: 445, timeout: 0.3, priority: 100}, ...], early_os: true}
+SCAN_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {"ports": [445, 22, 80], "early_os": True},
+    "default": {"ports": None, "early_os": False},
+    "deep": {"ports": list(TOP_100_PORTS), "early_os": False},
+}
+# Priorité par défaut : ports qui tranchent l'OS (_OS_RULES) puis services à forte valeur
+PORT_PRIORITY = {3389: 100, 445: 95, 139: 90, 53: 80, 389: 75, 22: 70, 3306: 60, 443: 50, 80: 45}
+
+
+# Colonnes reconnues du CSV composants, par ordre de préférence
+CSV_COLUMNS = {
+    "name": ("name", "hostname", "machine", "composant", "Composant"),
+    "product": ("product", "os", "OS", "Produit", "produit"),
+    "version": ("version", "cycle", "Version", "version_os"),
+}
+
+
+def _scan_opts(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: kwargs[k] for k in SCAN_OPTION_KEYS if kwargs.get(k) not in (None, "")}
+
+
+def _sampled(rows: Iterable[Dict[str, Any]], sample: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # Laisse passer le flux en gardant ses NTL_DETAILS_SAMPLE premières lignes (100 par défaut)
+    # pour ModuleResult.details : les volumes complets ne vivent que dans le rapport
+    limit = max(0, int(_env("NTL_DETAILS_SAMPLE", "100") or "100"))
+    for r in rows:
+        if len(sample) < limit:
+            sample.append(r)
+        yield r
+
+
 class AuditObsolescenceModule:
     def __init__(self, config: Dict[str, Any]):
         self.config = config or {}
@@ -203,41 +786,688 @@ class AuditObsolescenceModule:
         print(" [0] Retour\n")
         return input("Choix > ").strip()
 
-    def _scan_range(self, cidr: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        ports = [22, 53, 80, 443, 389, 445, 3389, 3306]
+    def _scan_profile(self, name: Optional[str] = None) -> Tuple[str, List[int], Dict[int, float], bool]:
+        """
+        Résout un profil de ports : `name`, sinon audit.scan_profile, NTL_SCAN_PROFILE
+        ou "default". Retourne (nom, ports triés par priorité décroissante,
+        timeouts par port, early_os). Les entrées de ports sont des entiers ou
+        des dicts {port, timeout, priority} ; priorité par défaut : PORT_PRIORITY.
+        """
+        audit_cfg = self.config.get("audit") or {}
+        name = (name or audit_cfg.get("scan_profile") or _env("NTL_SCAN_PROFILE", "default") or "default").strip().lower()
+        profiles = {**SCAN_PROFILES, **(audit_cfg.get("scan_profiles") or {})}
+        prof = profiles.get(name)
+        if not isinstance(prof, dict):
+            raise ValueError(f"Profil de scan inconnu: {name} (disponibles: {', '.join(sorted(profiles))})")
+
+        entries: List[Tuple[int, int, Optional[float]]] = []
+        for raw in prof.get("ports") or SCAN_PORTS:
+            try:
+                if isinstance(raw, dict):
+                    port = int(raw["port"])
+                    timeout = float(raw["timeout"]) if raw.get("timeout") is not None else None
+                    priority = int(raw.get("priority", PORT_PRIORITY.get(port, 0)))
+                else:
+                    port, timeout, priority = int(raw), None, PORT_PRIORITY.get(int(raw), 0)
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Port invalide dans le profil {name}: {raw!r}") from None
+            if not 0 < port < 65536 or any(port == e[0] for e in entries):
+                raise ValueError(f"Port invalide dans le profil {name}: {raw!r}")
+            entries.append((port, priority, timeout))
+
+        entries.sort(key=lambda e: -e[1])  # tri stable : l'ordre déclaré départage
+        ports = [port for port, _, _ in entries]
+        port_timeouts = {port: timeout for port, _, timeout in entries if timeout is not None}
+        return name, ports, port_timeouts, bool(prof.get("early_os", False))
+
+    def _scan_targets(self, spec: str) -> List[Tuple[str, Any]]:
+        """
+        `spec` : un CIDR, une liste "cidr1,cidr2", des noms de sites de la section
+        `networks` (siege, wh1...) ou ALL_SITES pour tous les sites configurés.
+        """
+        networks = {
+            k: v for k, v in (self.config.get("networks") or {}).items() if k != "default_scan" and isinstance(v, str) and v
+        }
+        tokens = [t.strip() for t in spec.replace(";", ",").split(",") if t.strip()]
+        if tokens == [ALL_SITES]:
+            if not networks:
+                raise ValueError("Aucun site dans la section 'networks' de la config")
+            tokens = list(networks)
+
+        targets: List[Tuple[str, Any]] = []
+        for t in tokens:
+            try:
+                targets.append((t, ipaddress.ip_network(networks.get(t, t), strict=False)))
+            except ValueError:
+                raise ValueError(f"Site ou CIDR invalide: {t}") from None
+            if targets[-1][1].version != 4:
+                raise ValueError(f"Scan IPv4 uniquement: {t}")
+        if not targets:
+            raise ValueError("Aucune plage réseau à scanner")
+        return targets
+
+    def _scan_range(
+        self,
+        cidr: str,
+        engine: Optional[str] = None,
+        discovery: Optional[bool] = None,
+        stream_path: Optional[str] = None,
+        since: Optional[str] = None,
+        rotate: Optional[int] = None,
+        adaptive: Optional[bool] = None,
+        rate: Optional[float] = None,
+        site_rate: Optional[float] = None,
+        banners: Optional[bool] = None,
+        checkpoint_path: Optional[str] = None,
+        resume: Optional[str] = None,
+        shards: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        profile: Optional[str] = None,
+        agents: Optional[str] = None,
+        jobs: Optional[int] = None,
+        sink: Optional[Any] = None,
+        budget_share: int = 1,
+        cache_path: Optional[str] = None,
+        refresh: Optional[bool] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Avec `stream_path`, chaque hôte trouvé est écrit en NDJSON dès sa fin de
+        sonde ; la vue triée renvoyée est ensuite reconstruite depuis ce fichier.
+
+        Avec `since` (inventaire précédent), les hôtes connus passent en premier,
+        le reste de la plage ensuite (ou seulement 1 adresse sur `rotate`, tranche
+        tournante selon le jour), et stats["delta"] donne les écarts.
+
+        Avec `adaptive`, chaque sous-réseau dérive son timeout des RTT mesurés
+        (voir _AdaptiveTimeout) ; les valeurs retenues sont dans stats.
+
+        `rate` / `site_rate` (sondes/s) limitent le débit global et par sous-réseau
+        (voir _RateGovernor) ; limites, recul et temps d'attente sont dans stats["rate"].
+
+        Avec `banners`, les hôtes ayant un port de BANNER_PORTS ouvert passent par
+        une lecture de bannière (voir _grab_services) : chaque hôte reçoit une
+        liste "services" (port, bannière, produit/version reconnus). Le NDJSON
+        de `stream_path` ne contient pas cette étape, faite après le balayage.
+
+        Avec `checkpoint_path`, la progression (blocs de NTL_SCAN_BLOCK adresses
+        terminés + hôtes trouvés) y est sauvegardée toutes les
+        NTL_SCAN_CHECKPOINT_INTERVAL secondes et à l'interruption ; `resume`
+        recharge un tel fichier et saute les blocs déjà terminés. Le checkpoint
+        est supprimé en fin de scan. Incompatible avec `since` (ordre non croissant).
+
+        Avec `shards` > 1 (NTL_SCAN_SHARDS), la plage de chaque site est découpée
+        en tranches contiguës balayées par autant de processus (voir _scan_sharded) ;
+        `shard` = (index, nombre) est l'usage interne côté processus, qui
+        reçoit aussi `budget_share` = nombre de processus se partageant la
+        concurrence et le débit de la machine.
+
+        `profile` (fast / default / deep ou profil de audit.scan_profiles, voir
+        _scan_profile) fixe les ports, leur ordre de priorité et leurs timeouts.
+
+        Avec `agents` ("hôte:port" d'écoute), le scan est distribué : chaque site
+        est découpé en `jobs` tranches (NTL_SCAN_AGENT_JOBS) confiées aux agents
+        `scan-agent` qui desservent ce site (voir _AgentController). `sink` (objet
+        write/close) est l'usage interne côté agent : les hôtes y partent au fil
+        du scan et l'inventaire renvoyé reste vide.
+
+        Avec `cache_path`, les hôtes déjà vus depuis moins de NTL_SCAN_CACHE_TTL
+        secondes (même liste de ports) ne sont pas re-sondés (voir _ScanCache) ;
+        `refresh` force le re-scan. Sans effet avec `since`, shards ou agents.
+        """
+        profile_name, ports, port_timeouts, early_os = self._scan_profile(profile)
         timeout_s = float(_env("NTL_SCAN_TIMEOUT", "0.4") or "0.4")
-        workers = int(_env("NTL_SCAN_WORKERS", "120") or "120")
-
-        net = ipaddress.ip_network(cidr, strict=False)
-        ips = [str(ip) for ip in net.hosts()]
-
-        results: List[Dict[str, Any]] = []
-
-        def worker(ip: str) -> Optional[Dict[str, Any]]:
-            open_ports = _tcp_ports(ip, ports, timeout_s=timeout_s)
-            if not open_ports:
-                return None
-            os_guess = _guess_os_from_ports(open_ports)
-            return {"ip": ip, "open_ports": sorted(open_ports), "os_guess": os_guess}
-
-        with ThreadPoolExecutor(max_workers=workers) as ex:
-            futs = [ex.submit(worker, ip) for ip in ips]
-            for f in as_completed(futs):
-                item = f.result()
-                if item:
-                    results.append(item)
-
-        results.sort(key=lambda x: tuple(int(p) for p in x["ip"].split(".")))
+        engine = (engine or _env("NTL_SCAN_ENGINE", "threads") or "threads").strip().lower()
+        if engine not in SCAN_ENGINES:
+            raise ValueError(f"Moteur de scan inconnu: {engine} (attendu: {', '.join(SCAN_ENGINES)})")
+        if discovery is None:
+            discovery = _env_flag("NTL_SCAN_DISCOVERY")
+        if adaptive is None:
+            adaptive = _env_flag("NTL_SCAN_ADAPTIVE")
+        if banners is None:
+            banners = _env_flag("NTL_SCAN_BANNERS")
+        if shards is None:
+            shards = int(_env("NTL_SCAN_SHARDS", "1") or "1")
+        if (agents or shards > 1) and shard is None:
+            if since or resume or checkpoint_path:
+                raise ValueError("Scan multi-processus / distribué incompatible avec since / checkpoint / reprise")
+            opts = {
+                "engine": engine,
+                "discovery": discovery,
+                "stream_path": stream_path,
+                "adaptive": adaptive,
+                "rate": rate,
+                "site_rate": site_rate,
+                "profile": profile_name,
+            }
+            if agents:
+                return self._scan_distributed(cidr, agents, jobs, opts, banners)
+            return self._scan_sharded(cidr, shards, opts, banners)
+
+        targets = self._scan_targets(cidr)
+        multi = len(targets) > 1
+        resumed: Dict[str, Any] = {}
+        if resume:
+            resumed = _load_checkpoint(resume)
+            if resumed.get("ports") != ports or set(resumed.get("done") or {}) - {site for site, _ in targets}:
+                raise ValueError(f"Checkpoint incompatible avec ce scan (plage ou ports différents): {resume}")
+            checkpoint_path = checkpoint_path or resume
+        if checkpoint_path and since:
+            raise ValueError("Reprise/checkpoint incompatible avec un re-scan différentiel (since)")
+        if engine == "asyncio":
+            workers = _fd_budget(int(_env("NTL_SCAN_CONCURRENCY", "1000") or "1000"))
+        else:
+            workers = int(_env("NTL_SCAN_WORKERS", "120") or "120")
+        # Budget global (concurrence, débit) réparti entre les processus de la machine
+        workers = max(1, workers // budget_share)
+        site_cap = int(_env("NTL_SCAN_SITE_CAP", str(max(1, workers // 2))) or "1") if multi else workers
+        site_cap = max(1, min(site_cap, workers))
+        timeouts = {
+            site: _AdaptiveTimeout(
+                timeout_s,
+                adaptive=adaptive,
+                k=float(_env("NTL_SCAN_RTT_K", "3") or "3"),
+                floor_s=float(_env("NTL_SCAN_TIMEOUT_FLOOR", "0.05") or "0.05"),
+                ceil_s=float(_env("NTL_SCAN_TIMEOUT_CEIL", "2.0") or "2.0"),
+            )
+            for site, _ in targets
+        }
+        governor = _RateGovernor(
+            (rate if rate is not None else float(_env("NTL_SCAN_RATE", "0") or "0")) / budget_share,
+            (site_rate if site_rate is not None else float(_env("NTL_SCAN_SITE_RATE", "0") or "0")) / budget_share,
+        )
+
+        t0 = time.monotonic()
+        ranges = {site: _iter_hosts(net) for site, net in targets}
+        if shard is not None:
+            index, count = shard
+            ranges = {site: r[len(r) * index // count : len(r) * (index + 1) // count] for site, r in ranges.items()}
+        hosts: Dict[str, Iterable[int]] = dict(ranges)
+        inventory = _CompactInventory(ports, sites=[site for site, _ in targets] if multi else None)
+        checkpoint: Optional[_Checkpoint] = None
+        trackers: Dict[str, _BlockTracker] = {}
+        if checkpoint_path:
+            block_size = int(resumed.get("block_size") or _env("NTL_SCAN_BLOCK", "256") or "256")
+            checkpoint = _Checkpoint(
+                checkpoint_path,
+                float(_env("NTL_SCAN_CHECKPOINT_INTERVAL", "30") or "30"),
+                cidr,
+                ports,
+                block_size,
+                inventory,
+                stream_path=stream_path,
+            )
+            done = resumed.get("done") or {}
+            for site, _ in targets:
+                trackers[site] = checkpoint.trackers[site] = _BlockTracker(block_size, done.get(site, ()), checkpoint)
+
+        external_sink = sink
+        if sink is None and stream_path:
+            sink = _NdjsonSink(stream_path)
+        if checkpoint is not None:
+            # Hôtes déjà trouvés dans les blocs terminés ; les blocs partiels seront re-sondés
+            previous_items = list(resumed.get("inventory") or [])
+            if resumed.get("stream_path") and os.path.exists(resumed["stream_path"]):
+                previous_items += _read_ndjson(resumed["stream_path"])
+            for item in previous_items:
+                site = item.get("site") or targets[0][0]
+                if site in trackers and trackers[site].is_done(_ip_int(item["ip"])):
+                    if sink is not None:
+                        sink.write(item)
+                    else:
+                        inventory.add_dict(item)
+
+        alive_by_site: Dict[str, List[int]] = {}
+        discovery_by_site: Dict[str, Dict[str, Any]] = {}
+        cache: Optional[_ScanCache] = None
+        if cache_path and not since:
+            cache = _ScanCache(
+                cache_path,
+                float(_env("NTL_SCAN_CACHE_TTL", "3600") or "3600"),
+                int(_env("NTL_SCAN_CACHE_MAX", "65536") or "65536"),
+                ports,
+                refresh=bool(refresh),
+            )
+        try:
+            if discovery:
+                # Les blocs déjà terminés (reprise) et les hôtes frais du cache ne reçoivent pas de
+                # sonde de liveness ; les blocs entièrement sondés sans hôte vivant sont marqués
+                # terminés par la découverte
+                alive_by_site, discovery_by_site = self._discover_hosts(
+                    targets, ranges, engine, timeouts, workers, site_cap, governor, trackers=trackers, cache=cache
+                )
+                hosts.update(alive_by_site)
+
+            pairs: Dict[str, Iterable[Tuple[str, int]]] = {}
+            previous: List[Dict[str, Any]] = []
+            rotation: Dict[str, int] = {"slices": 1, "slice": 0, "swept_unknown": 0}
+            if since:
+                previous = [h for h in _load_inventory(since) if any(ipaddress.ip_address(h["ip"]) in net for _, net in targets)]
+                rotation["slices"] = max(1, int(rotate or _env("NTL_SCAN_ROTATE", "1") or "1"))
+                rotation["slice"] = date.today().toordinal() % rotation["slices"]
+                known_ips = {_ip_int(h["ip"]) for h in previous}
+                for site, net in targets:
+                    known = sorted((h for h in previous if ipaddress.ip_address(h["ip"]) in net), key=_ip_sort_key)
+                    rest = (
+                        ip for ip in hosts[site] if ip not in known_ips and ip % rotation["slices"] == rotation["slice"]
+                    )
+                    pairs[site] = _diff_pairs(known, rest, ports, rotation)
+
+            if checkpoint is not None:
+                for site, _ in targets:
+                    hosts[site] = trackers[site].feed(hosts[site])
+
+            collectors = {
+                site: _HostCollector(inventory, site_idx=i, sink=sink, tracker=trackers.get(site), early_os=early_os and not since)
+                for i, (site, _) in enumerate(targets)
+            }
+            if cache is not None:
+                for site, _ in targets:
+                    collectors[site].cache = cache
+                    hosts[site] = cache.filter(hosts[site], collectors[site])
+            if not since:
+                pairs = {site: _host_port_pairs(hosts[site], ports, early=collectors[site] if early_os else None) for site, _ in targets}
+            t1 = time.monotonic()
+            lanes = [
+                _Lane(
+                    pairs[site], collectors[site], site_cap, timeouts[site], name=site, governor=governor, port_timeouts=port_timeouts
+                )
+                for site, _ in targets
+            ]
+            self._run_probes(engine, lanes, workers)
+        except BaseException:
+            if checkpoint is not None:
+                checkpoint.save()
+                print(f"\n[!] Scan interrompu, progression sauvegardée : --resume {checkpoint.path}")
+            raise
+        finally:
+            if sink is not None and sink is not external_sink:
+                sink.close()
+            if cache is not None:
+                cache.save()
+        duration_s = time.monotonic() - t0
+        if checkpoint is not None and os.path.exists(checkpoint.path):
+            os.remove(checkpoint.path)
+
+        # Une tranche (shard) partage le NDJSON avec les autres : c'est le parent qui le relit
+        if stream_path and shard is None:
+            for item in _read_ndjson(stream_path):
+                inventory.add_dict(item)
+        inventory.sort()
+        results = inventory.to_dicts()
+        banner_stats = self._grab_services(results, workers) if banners else None
+
+        sites: Dict[str, Dict[str, Any]] = {}
+        probes = 0
+        for site, net in targets:
+            col = collectors[site]
+
+            site_stats: Dict[str, Any] = {"cidr": str(net), "found_hosts": col.found, "probes": col.probes}
+            disc = discovery_by_site.get(site)
+            if disc is not None:
+                swept = len(alive_by_site[site])
+                disc["sweep"] = {
+                    "hosts": swept,
+                    "pruned": swept - col.found,
+                    "duration_s": round((col.last_t or t1) - t1, 3),
+                }
+                site_stats["probes"] += disc["liveness"]["probes"]
+                site_stats["discovery"] = disc
+            site_stats["timeout"] = timeouts[site].to_dict()
+            site_stats["throttle_s"] = round(governor.throttle_s.get(site, 0.0), 3)
+            site_stats["duration_s"] = round((col.last_t or t1) - t0, 3)
+            probes += site_stats["probes"]
+            sites[site] = site_stats
 
         stats = {
-            "cidr": cidr,
-            "found_hosts": len(results),
+            "cidr": cidr if not multi else ",".join(str(net) for _, net in targets),
+            "found_hosts": len(results) if external_sink is None and shard is None else sum(c.found for c in collectors.values()),
             "ports_checked": ports,
             "timeout_s": timeout_s,
             "workers": workers,
+            "engine": engine,
+            "probes": probes,
+            "duration_s": round(duration_s, 3),
+            "rate": governor.to_dict(),
+            "profile": {
+                "name": profile_name,
+                "ports": len(ports),
+                "port_timeouts": {str(p): t for p, t in port_timeouts.items()},
+                "early_os": early_os,
+                "early_skipped": sum(c.skipped for c in collectors.values()),
+            },
         }
+        if stream_path:
+            stats["stream_path"] = stream_path
+        if banner_stats is not None:
+            stats["banners"] = banner_stats
+        if checkpoint is not None:
+            stats["checkpoint"] = checkpoint.to_dict()
+        if cache is not None:
+            stats["cache"] = cache.to_dict()
+        if shard is not None:
+            stats["shard"] = {"index": shard[0], "count": shard[1], "hosts": sum(len(r) for r in ranges.values())}
+        if since:
+            stats["delta"] = {"since": since, **_inventory_delta(previous, results), "rotation": rotation}
+        if multi:
+            stats["site_cap"] = site_cap
+            stats["sites"] = sites
+        else:
+            if adaptive:
+                stats["timeout"] = sites[targets[0][0]]["timeout"]
+            if discovery:
+                stats["discovery"] = sites[targets[0][0]]["discovery"]
         return results, stats
 
+    def _discover_hosts(
+        self,
+        targets: List[Tuple[str, Any]],
+        ranges: Dict[str, range],
+        engine: str,
+        timeouts: Dict[str, _AdaptiveTimeout],
+        workers: int,
+        site_cap: int,
+        governor: Optional[_RateGovernor] = None,
+        trackers: Optional[Dict[str, _BlockTracker]] = None,
+        cache: Optional[_ScanCache] = None,
+    ) -> Tuple[Dict[str, List[int]], Dict[str, Dict[str, Any]]]:
+        """
+        Phase 1 : une sonde de liveness par adresse (connexion acceptée OU refusée),
+        puis lecture de /proc/net/arp : sur un sous-réseau directement connecté,
+        la sonde a déclenché une résolution ARP, donc un hôte qui filtre tout
+        apparaît quand même dans la table de voisinage.
+        Les adresses des blocs terminés d'un checkpoint (`trackers`) sont exclues ;
+        un bloc entièrement sondé sans hôte vivant (TCP ou ARP) y est marqué
+        terminé, y compris si la découverte est interrompue : la reprise ne le
+        re-sonde pas.
+        Les hôtes frais du `cache` ne sont pas sondés : ils sont renvoyés tels
+        quels avec les vivants, le balayage les sert ensuite depuis le cache.
+        """
+        trackers = trackers or {}
+        # Blocs dont toutes les adresses ont reçu leur sonde de liveness
+        probed = {site: _BlockTracker(t.block_size) for site, t in trackers.items()}
+        cached: Dict[str, Set[int]] = {site: set() for site, _ in targets}
+
+        def uncached(site: str, ips: Iterable[int]) -> Iterator[int]:
+            for ip in ips:
+                if cache is not None and cache.fresh(ip):
+                    cached[site].add(ip)
+                else:
+                    yield ip
+
+        def pending(site: str) -> Iterable[int]:
+            tracker = trackers.get(site)
+            if tracker is None:
+                return uncached(site, ranges[site])
+            return probed[site].feed(uncached(site, (ip for ip in ranges[site] if not tracker.is_done(ip))))
+
+        def close_empty_blocks(arp_table: List[int]) -> None:
+            for site, tracker in trackers.items():
+                alive = {_ip_int(h) for h in collectors[site].alive} | {ip for ip in arp_table if ip in ranges[site]}
+                alive |= cached[site]
+                tracker.mark_done(probed[site].done - {ip // tracker.block_size for ip in alive})
+
+        port = int(_env("NTL_SCAN_LIVENESS_PORT", "80") or "80")
+        t0 = time.monotonic()
+
+        collectors = {site: _AliveCollector(tracker=probed.get(site)) for site, _ in targets}
+        lanes = [
+            _Lane(
+                _host_port_pairs(pending(site), [port]),
+                collectors[site],
+                site_cap,
+                timeouts[site],
+                accept=("open", "closed"),
+                name=site,
+                governor=governor,
+            )
+            for site, _ in targets
+        ]
+        try:
+            self._run_probes(engine, lanes, workers)
+        except BaseException:
+            close_empty_blocks([_ip_int(ip) for ip in _read_arp_table()])
+            raise
+        arp_table = [_ip_int(ip) for ip in _read_arp_table()]
+        close_empty_blocks(arp_table)
+
+        alive_by_site: Dict[str, List[int]] = {}
+        stats_by_site: Dict[str, Dict[str, Any]] = {}
+        for site, _ in targets:
+            col = collectors[site]
+            tracker = trackers.get(site)
+            arp = {ip for ip in arp_table if ip in ranges[site] and ip not in cached[site] and not (tracker and tracker.is_done(ip))}
+            tcp = {_ip_int(h) for h in col.alive}
+            alive = tcp | arp
+            alive_by_site[site] = sorted(alive | cached[site])
+            stats_by_site[site] = {
+                "liveness": {
+                    "port": port,
+                    "candidates": col.probes + len(cached[site]),
+                    "probes": col.probes,
+                    "cached": len(cached[site]),
+                    "alive_tcp": len(col.alive),
+                    "alive_arp_only": len(arp - tcp),
+                    "pruned": col.probes - len(alive),
+                    "duration_s": round((col.last_t or t0) - t0, 3),
+                }
+            }
+        return alive_by_site, stats_by_site
+
+    def _scan_sharded(
+        self, cidr: str, shards: int, opts: Dict[str, Any], banners: bool
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Un processus par tranche (chacun avec son pool de threads ou sa boucle
+        asyncio, selon `engine`), puis fusion au format d'inventaire habituel.
+        Les bannières sont lues une seule fois, sur l'inventaire fusionné.
+        """
+        targets = self._scan_targets(cidr)
+        _, ports, _, _ = self._scan_profile(opts.get("profile"))
+        t0 = time.monotonic()
+        with ProcessPoolExecutor(max_workers=shards) as ex:
+            futs = [ex.submit(_scan_shard, self.config, cidr, (i, shards), opts) for i in range(shards)]
+            parts = [f.result() for f in futs]
+        return self._merge_shards(targets, ports, parts, time.monotonic() - t0, opts.get("stream_path"), banners)
+
+    def _scan_distributed(
+        self, cidr: str, listen: str, jobs: Optional[int], opts: Dict[str, Any], banners: bool
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Contrôleur : attend les agents sur `listen`, leur distribue les tranches
+        (`jobs` par site, chaque agent ne recevant que celles des sites qu'il
+        dessert) et fusionne comme _scan_sharded. Avec un stream_path, chaque
+        tranche validée y est écrite dès réception.
+        """
+        targets = self._scan_targets(cidr)
+        _, ports, _, _ = self._scan_profile(opts.get("profile"))
+        jobs = max(1, int(jobs or _env("NTL_SCAN_AGENT_JOBS", "16") or "16"))
+        stream_path = opts.get("stream_path")
+        agent_opts = {k: v for k, v in opts.items() if k in AGENT_OPTION_KEYS}
+        token = _env("NTL_SCAN_AGENT_TOKEN")
+        if not token:
+            print("[!] NTL_SCAN_AGENT_TOKEN absent : tout hôte joignant le contrôleur peut injecter des hôtes dans l'inventaire")
+        controller = _AgentController(
+            listen,
+            [site for site, _ in targets],
+            jobs,
+            _agent_config(self.config),
+            agent_opts,
+            token=token,
+            heartbeat_s=float(_env("NTL_SCAN_AGENT_HEARTBEAT", "15") or "15"),
+        )
+        sink = controller.sink = _NdjsonSink(stream_path) if stream_path else None
+        t0 = time.monotonic()
+        try:
+            parts = controller.serve(float(_env("NTL_SCAN_AGENT_WAIT", "300") or "300"))
+        finally:
+            controller.close()
+            if sink is not None:
+                sink.close()
+        results, stats = self._merge_shards(targets, ports, parts, time.monotonic() - t0, stream_path, banners)
+        stats["agents"] = controller.to_dict()
+        return results, stats
+
+    def _merge_shards(
+        self,
+        targets: List[Tuple[str, Any]],
+        ports: List[int],
+        parts: List[Tuple[List[Dict[str, Any]], Dict[str, Any]]],
+        duration_s: float,
+        stream_path: Optional[str],
+        banners: bool,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        # Fusion des tranches (processus ou agents) au format d'inventaire habituel
+        multi = len(targets) > 1
+        inventory = _CompactInventory(ports, sites=[site for site, _ in targets] if multi else None)
+        items: Iterable[Dict[str, Any]] = (
+            _read_ndjson(stream_path) if stream_path else (item for inv, _ in parts for item in inv)
+        )
+        for item in items:
+            inventory.add_dict(item)
+        inventory.sort()
+        results = inventory.to_dicts()
+        banner_stats = self._grab_services(results, sum(st["workers"] for _, st in parts)) if banners else None
+
+        shard_stats: List[Dict[str, Any]] = []
+        for _, st in parts:
+            entry = {**st["shard"], "found_hosts": st["found_hosts"], "probes": st["probes"], "duration_s": st["duration_s"]}
+            entry.update({k: st[k] for k in ("workers", "rate", "timeout", "discovery", "sites") if k in st})
+            shard_stats.append(entry)
+
+        def site_parts(site: str) -> List[Dict[str, Any]]:
+            # Tranche de processus : stats par site ; tranche d'agent : un seul site par tranche
+            out = []
+            for _, st in parts:
+                if "sites" in st:
+                    out.append(st["sites"][site])
+                elif st["shard"].get("site") == site:
+                    out.append(st)
+            return out
+
+        first = parts[0][1]
+        stats: Dict[str, Any] = {
+            "cidr": ",".join(str(net) for _, net in targets) if multi else first["cidr"],
+            "found_hosts": len(results),
+            "ports_checked": ports,
+            "timeout_s": first["timeout_s"],
+            "workers": sum(st["workers"] for _, st in parts),
+            "engine": first["engine"],
+            "probes": sum(st["probes"] for _, st in parts),
+            "duration_s": round(duration_s, 3),
+            "shards": shard_stats,
+            "profile": {**first["profile"], "early_skipped": sum(st["profile"]["early_skipped"] for _, st in parts)},
+        }
+        if stream_path:
+            stats["stream_path"] = stream_path
+        if banner_stats is not None:
+            stats["banners"] = banner_stats
+        if multi:
+            if "site_cap" in first:
+                stats["site_cap"] = first["site_cap"]
+            stats["sites"] = {
+                site: {
+                    "cidr": str(net),
+                    "found_hosts": sum(st["found_hosts"] for st in site_parts(site)),
+                    "probes": sum(st["probes"] for st in site_parts(site)),
+                    "duration_s": max((st["duration_s"] for st in site_parts(site)), default=0.0),
+                }
+                for site, net in targets
+            }
+        return results, stats
+
+    def _grab_services(self, inventory: List[Dict[str, Any]], workers: int) -> Dict[str, Any]:
+        """
+        Étape bannières, après le balayage : peu d'hôtes/ports concernés, donc
+        un simple pool de threads quel que soit le moteur de scan.
+        """
+        timeout_s = float(_env("NTL_SCAN_BANNER_TIMEOUT", "1.5") or "1.5")
+        jobs = [(h, p, BANNER_PORTS[p]) for h in inventory for p in h["open_ports"] if p in BANNER_PORTS]
+        grabbed = identified = 0
+        t0 = time.monotonic()
+        if jobs:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as ex:
+                futs = {ex.submit(_grab_banner, h["ip"], p, proto, timeout_s): (h, p, proto) for h, p, proto in jobs}
+                for f in as_completed(futs):
+                    h, port, proto = futs[f]
+                    banner = f.result()
+                    if not banner:
+                        continue
+                    grabbed += 1
+                    svc: Dict[str, Any] = {"port": port, "banner": banner}
+                    found = _product_from_banner(proto, banner)
+                    if found:
+                        svc["product"], svc["version"] = found
+                        identified += 1
+                    h.setdefault("services", []).append(svc)
+        for h in inventory:
+            if "services" in h:
+                h["services"].sort(key=lambda svc: svc["port"])
+        return {
+            "candidates": len(jobs),
+            "grabbed": grabbed,
+            "identified": identified,
+            "timeout_s": timeout_s,
+            "duration_s": round(time.monotonic() - t0, 3),
+        }
+
+    def _run_probes(self, engine: str, lanes: List[_Lane], workers: int) -> None:
+        if engine == "asyncio":
+            asyncio.run(self._scan_pairs_asyncio(lanes, workers))
+        else:
+            self._scan_pairs_threads(lanes, workers)
+
+    def _scan_pairs_threads(self, lanes: List[_Lane], workers: int) -> None:
+        """
+        Une sonde (hôte, port) = une tâche du pool ; `workers` est le budget global.
+        Remplissage round-robin entre les files, chacune bornée par son plafond.
+        """
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            inflight: Dict[Any, Tuple[_Lane, str, int]] = {}
+            active = list(lanes)
+            while active or inflight:
+                progressed = True
+                while progressed and active and len(inflight) < workers:
+                    progressed = False
+                    for lane in list(active):
+                        if len(inflight) >= workers:
+                            break
+                        if lane.inflight >= lane.cap:
+                            continue
+                        nxt = next(lane.pairs, None)
+                        if nxt is None:
+                            active.remove(lane)
+                            continue
+                        lane.inflight += 1
+                        inflight[ex.submit(_paced_connect, lane, nxt[0], nxt[1])] = (lane, nxt[0], nxt[1])
+                        progressed = True
+                if not inflight:
+                    continue
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for f in done:
+                    lane, host, port = inflight.pop(f)
+                    lane.inflight -= 1
+                    lane.done(host, port, f.result())
+
+    async def _scan_pairs_asyncio(self, lanes: List[_Lane], concurrency: int) -> None:
+        """
+        Moteur événementiel : un seul thread, connexions non bloquantes.
+        Chaque file a `cap` coroutines qui consomment ses paires (hôte, port) ;
+        le sémaphore commun (FIFO, donc équitable entre sites) est le budget global.
+        """
+        gate = asyncio.Semaphore(concurrency)
+
+        async def worker(lane: _Lane) -> None:
+            for host, port in lane.pairs:
+                async with gate:
+                    if lane.governor is not None:
+                        wait_s = lane.governor.delay(lane.name)
+                        if wait_s > 0:
+                            await asyncio.sleep(wait_s)
+                    result = await _tcp_connect_async(host, port, lane.timeout_for(port))
+                lane.done(host, port, result)
+
+        await asyncio.gather(*(worker(lane) for lane in lanes for _ in range(min(lane.cap, concurrency))))
+
     def _list_versions_eol(self, product: str) -> Tuple[List[Dict[str, Any]], EOLMeta]:
         data, meta = self.provider.fetch_product(product)
         rows: List[Dict[str, Any]] = []
@@ -258,114 +1488,395 @@ class AuditObsolescenceModule:
         rows = [r for r in rows if r.get("cycle")]
         return rows, meta
 
-    def _read_components_csv(self, path: str) -> List[Dict[str, str]]:
+    def _iter_components_csv(self, path: str) -> Iterator[Tuple[str, str, str]]:
+        """
+        Lecture en flux du CSV composants : tuples (name, product, version), une
+        ligne en mémoire à la fois. Les colonnes de chaque champ sont résolues une
+        seule fois depuis l'en-tête (CSV_COLUMNS, par ordre de préférence ; la
+        1re colonne non vide l'emporte, comme avant).
+        """
         if not os.path.exists(path):
             raise FileNotFoundError(f"CSV introuvable: {path}")
 
-        with open(path, "r", encoding="utf-8-sig", newline="") as f:
-            sample = f.read(2048)
-            f.seek(0)
+        def rows() -> Iterator[Tuple[str, str, str]]:
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                sample = f.read(2048)
+                f.seek(0)
+                try:
+                    dialect = csv.Sniffer().sniff(sample, delimiters=";,")
+                except Exception:
+                    dialect = csv.excel
+                reader = csv.reader(f, dialect=dialect)
+                header = next(reader, [])
+                cols = {
+                    field: [header.index(a) for a in aliases if a in header]
+                    for field, aliases in CSV_COLUMNS.items()
+                }
+                name_cols, product_cols, version_cols = cols["name"], cols["product"], cols["version"]
+
+                def first(row: List[str], idx: List[int]) -> str:
+                    for i in idx:
+                        if i < len(row) and row[i]:
+                            return row[i]
+                    return ""
+
+                for row in reader:
+                    product = first(row, product_cols).strip().lower()
+                    version = first(row, version_cols).strip()
+                    if not product or not version:
+                        continue
+                    yield first(row, name_cols).strip() or "(n/a)", product, version
+
+        return rows()
+
+    def _resolve_components(
+        self, components: Iterable[Any], soon_days: int, meta_by_product: Dict[str, EOLMeta], stats: Dict[str, Any]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Statut support de chaque composant : dict name/product/version ou tuple
+        (name, product, version), éventuellement issu d'un flux (_iter_components_csv).
+        Générateur : traitement par lots de NTL_CSV_CHUNK composants (50000 par
+        défaut), les lignes résolues d'un lot sont produites avant la lecture du
+        suivant ; seul le lot courant est en mémoire. `meta_by_product` est
+        rempli au fil des lots, `stats` à la fin de la passe. Un appel EOLProvider par produit, la
+        première fois qu'il apparaît, en parallèle au sein du lot
+        (NTL_EOL_WORKERS, 8 par défaut) : le temps est celui du produit le plus
+        lent, pas la somme. Chaque EOLMeta porte sa latence (fetch_ms) et son
+        statut de cache.
+        Un produit injoignable ou inconnu de endoflife.date laisse ses
+        composants en UNKNOWN (mode "error").
+        Le statut est calculé une fois par paire (produit, version) unique, par
+        lot vectorisé (_eol_days / _eol_statuses), puis recopié sur chaque
+        composant ; stats : composants par statut (`counts`), paires uniques,
+        ratio de déduplication, temps de résolution, débit (lignes/s, lecture
+        comprise) et projection des EOL à 30/90/180/365 jours (`horizons`).
+        """
+
+        def fetch(product: str) -> Tuple[List[Dict[str, Any]], EOLMeta]:
+            t0 = time.monotonic()
             try:
-                dialect = csv.Sniffer().sniff(sample, delimiters=";,")
+                rows, meta = self._list_versions_eol(product)
             except Exception:
-                dialect = csv.excel
-            reader = csv.DictReader(f, dialect=dialect)
-
-            items: List[Dict[str, str]] = []
-            for row in reader:
-                product = (row.get("product") or row.get("os") or row.get("OS") or row.get("Produit") or row.get("produit") or "").strip().lower()
-                version = (row.get("version") or row.get("cycle") or row.get("Version") or row.get("version_os") or "").strip()
-                name = (row.get("name") or row.get("hostname") or row.get("machine") or row.get("composant") or row.get("Composant") or "").strip()
+                rows, meta = [], EOLMeta(source="endoflife.date", fetched_at_iso="", api_mode="error", cache="miss")
+            meta.fetch_ms = round((time.monotonic() - t0) * 1000, 1)
+            return rows, meta
+
+        chunk_size = max(1, int(_env("NTL_CSV_CHUNK", "50000") or "50000"))
+        max_workers = max(1, int(_env("NTL_EOL_WORKERS", "8") or "8"))
+        today = datetime.now().date()
+        indexes: Dict[str, _CycleIndex] = {}
+        pair_idx: Dict[str, Dict[str, int]] = {}  # produit -> version -> n° de paire
+        pair_days = array("q")
+        pair_weights = array("q")
+        pair_status: List[Tuple[str, Optional[str]]] = []
+        counts = {"OK": 0, "SOON": 0, "EOL": 0, "UNKNOWN": 0}
+        total = 0
+        resolve_s = 0.0
+        chunks = 0
+        started = time.monotonic()
+        it = iter(components)
+
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                break
+            chunks += 1
+            by_product: Dict[str, List[Tuple[str, str]]] = {}
+            for c in chunk:
+                name, product, version = c if isinstance(c, tuple) else (c["name"], c["product"], c["version"])
+                by_product.setdefault(product, []).append((name, version))
+
+            new = [p for p in by_product if p not in meta_by_product]
+            if new:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(new))) as ex:
+                    for product, (rows, meta) in zip(new, ex.map(fetch, new)):
+                        meta_by_product[product] = meta
+                        indexes[product] = _CycleIndex(rows)
+                        pair_idx[product] = {}
+
+            t0 = time.monotonic()
+            # 1) paires nouvelles du lot -> statuts calculés d'un bloc
+            eols: List[Any] = []
+            for product, comps in by_product.items():
+                index, idx = indexes[product], pair_idx[product]
+                for _, v in comps:
+                    if v not in idx:
+                        idx[v] = len(pair_status) + len(eols)
+                        match = index.match(v)
+                        eols.append(match.get("eol") if match else None)
+            if eols:
+                days, shown = _eol_days(eols)
+                pair_status.extend(zip(_eol_statuses(today, days, soon_days), shown))
+                pair_days.extend(days)
+                pair_weights.extend([0] * len(eols))
+
+            # 2) recopie sur les composants
+            resolved: List[Dict[str, Any]] = []
+            for product, comps in by_product.items():
+                idx = pair_idx[product]
+                for name, v in comps:
+                    i = idx[v]
+                    pair_weights[i] += 1
+                    st, eol_date = pair_status[i]
+                    counts[st] += 1
+                    resolved.append({"name": name, "product": product, "version": v, "eol_date": eol_date, "support_status": st})
+            total += len(resolved)
+            resolve_s += time.monotonic() - t0
+            yield from resolved
+
+        elapsed = time.monotonic() - started
+        unique_pairs = len(pair_status)
+        stats.update(
+            {
+                "components": total,
+                "counts": counts,
+                "unique_pairs": unique_pairs,
+                "dedupe_ratio": round(total / unique_pairs, 2) if unique_pairs else 0.0,
+                "resolve_ms": round(resolve_s * 1000, 1),
+                "chunks": chunks,
+                "rows_per_s": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+                "horizons": _eol_horizons(today, pair_days, pair_weights),
+                "vectorised": "numpy" if np is not None else "array",
+            }
+        )
+
+    def _build_eol_snapshot(self, out_path: str, products: List[str]) -> Dict[str, Any]:
+        """
+        Récupère `products` en un seul lot parallèle (NTL_EOL_WORKERS, via le
+        cache local) et les écrit dans un snapshot indexé (_write_eol_snapshot).
+        Les produits en erreur sont listés dans "failed", sans bloquer le lot.
+        """
+        t0 = time.monotonic()
+
+        def fetch(product: str) -> Optional[Dict[str, Any]]:
+            try:
+                data, meta = self.provider.fetch_product(product)
+            except Exception:
+                return None
+            if meta.api_mode == "offline":
+                return None
+            return {"data": data, "fetched_at_iso": meta.fetched_at_iso, "source": "endoflife.date", "api_mode": meta.api_mode}
 
-                if not product or not version:
-                    continue
-                items.append({"name": name or "(n/a)", "product": product, "version": version})
-        return items
+        workers = max(1, min(int(_env("NTL_EOL_WORKERS", "8") or "8"), len(products) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            fetched = dict(zip(products, ex.map(fetch, products)))
 
-    def _match_cycle(self, rows: List[Dict[str, Any]], version: str) -> Optional[Dict[str, Any]]:
-        v = version.strip()
-        for r in rows:
-            c = str(r.get("cycle", "")).strip()
-            if not c:
-                continue
-            if v == c or v.startswith(c + ".") or v.startswith(c + " "):
-                return r
-        return None
+        entries = {p: e for p, e in fetched.items() if e is not None}
+        info = _write_eol_snapshot(out_path, entries)
+        info["failed"] = sorted(p for p, e in fetched.items() if e is None)
+        info["duration_s"] = round(time.monotonic() - t0, 2)
+        return info
 
     def _generate_html_report(
         self,
         inventory: Optional[List[Dict[str, Any]]],
-        components: List[Dict[str, Any]],
+        components: Iterable[Dict[str, Any]],
         out_path: str,
         meta_by_product: Dict[str, EOLMeta],
         soon_days: int,
+        resolve_stats: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
+        """
+        Rapport HTML écrit en flux, en une seule passe sur `components` (tout
+        itérable, par ex. le générateur de _resolve_components) :
+        - pages de NTL_REPORT_PAGE_SIZE composants (5000 par défaut) écrites dans
+          <nom>_pages/ au fil de l'eau ; une page n'a que des liens relatifs
+          (index, précédente, suivante) : le nombre total de pages n'est pas
+          connu tant que la passe n'est pas finie ;
+        - chaque page embarque ses lignes en JSON compact, affichées par une
+          table virtualisée côté navigateur (seules les lignes visibles sont
+          dans le DOM) avec filtre ;
+        - agrégats par statut et par produit calculés pendant la même passe ;
+          l'index (out_path), écrit en dernier, porte le nombre de pages, les
+          liens vers chacune, les agrégats, les sources EOL, les horizons et
+          l'inventaire. `meta_by_product` et `resolve_stats` ne sont lus qu'à ce
+          moment : ils peuvent être remplis par le générateur consommé ici.
+        Seule la page en cours est en mémoire ; écritures tamponnées, par blocs
+        plutôt que cellule par cellule.
+        """
+        page_size = max(1, int(_env("NTL_REPORT_PAGE_SIZE", "5000") or "5000"))
+        buffering = 1024 * 1024
+        out = Path(out_path)
+        pages_dir = out.with_name(out.stem + "_pages")
+        _ensure_dir(str(out.parent))
+        page_paths: List[str] = []
+
+        def write_page(rows: List[List[Any]], has_next: bool) -> None:
+            page_no = len(page_paths) + 1
+            if page_no == 1:
+                _ensure_dir(str(pages_dir))
+            path = str(pages_dir / f"page_{page_no:04d}.html")
+            links = [f"<a href='../{out.name}'>Index</a>"]
+            if page_no > 1:
+                links.append(f"<a href='page_{page_no - 1:04d}.html'>&larr; Page {page_no - 1}</a>")
+            if has_next:
+                links.append(f"<a href='page_{page_no + 1:04d}.html'>Page {page_no + 1} &rarr;</a>")
+            with open(path, "w", encoding="utf-8", buffering=buffering) as f:
+                f.write(_report_head(f"Audit d'obsolescence - page {page_no}"))
+                f.write(f"<h1>Audit d'obsolescence - page {page_no}</h1>")
+                f.write(_report_table(rows, " ".join(links)))
+                f.write("</body></html>")
+            page_paths.append(path)
+
+        # Passe unique : une page pleine est écrite dès que la ligne suivante arrive
+        # (on sait alors qu'elle a une suivante) ; agrégats au passage
+        code = {st: i for i, st in enumerate(_STATUS_BY_CODE)}
         counts = {"OK": 0, "SOON": 0, "EOL": 0, "UNKNOWN": 0}
+        by_product: Dict[str, Dict[str, int]] = {}
+        rows: List[List[Any]] = []
         for c in components:
-            counts[c["support_status"]] += 1
-
-        _ensure_dir(str(Path(out_path).parent))
-
-        def esc(s: Any) -> str:
-            return str(s).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write("<!doctype html><html><head><meta charset='utf-8'>")
-            f.write("<title>NTL SysToolbox - Audit d'obsolescence</title>")
-            f.write("<style>body{font-family:Arial,Helvetica,sans-serif;margin:24px} table{border-collapse:collapse;width:100%} td,th{border:1px solid #ddd;padding:8px} th{background:#f3f3f3} .ok{background:#e9ffe9} .soon{background:#fff7d6} .eol{background:#ffe2e2} .unk{background:#f0f0f0}</style>")
-            f.write("</head><body>")
-            f.write(f"<h1>Audit d'obsolescence</h1>")
-            f.write(f"<p>Généré le <b>{esc(datetime.now().isoformat(timespec='seconds'))}</b> | Seuil 'bientôt' = {soon_days} jours</p>")
-
-            f.write("<h2>Sources EOL (référence + date de validité)</h2><ul>")
-            for prod, m in meta_by_product.items():
-                f.write(f"<li>{esc(prod)} — source: {esc(m.source)} — fetch: {esc(m.fetched_at_iso)} — mode: {esc(m.api_mode)}</li>")
-            f.write("</ul>")
-
-            f.write("<h2>Résumé</h2><ul>")
-            f.write(f"<li>OK: {counts['OK']}</li>")
-            f.write(f"<li>Bientôt EOL: {counts['SOON']}</li>")
-            f.write(f"<li>EOL: {counts['EOL']}</li>")
-            f.write(f"<li>Inconnu: {counts['UNKNOWN']}</li>")
-            f.write("</ul>")
+            if len(rows) == page_size:
+                write_page(rows, has_next=True)
+                rows = []
+            st = c["support_status"]
+            counts[st] += 1
+            agg = by_product.get(c["product"])
+            if agg is None:
+                agg = by_product[c["product"]] = {"OK": 0, "SOON": 0, "EOL": 0, "UNKNOWN": 0}
+            agg[st] += 1
+            rows.append([c["name"], c["product"], c["version"], c.get("eol_date") or "", code[st]])
+        if rows:
+            write_page(rows, has_next=False)
+
+        # Index
+        parts: List[str] = [
+            _report_head("NTL SysToolbox - Audit d'obsolescence"),
+            "<h1>Audit d'obsolescence</h1>",
+            f"<p>Généré le <b>{_esc(datetime.now().isoformat(timespec='seconds'))}</b> | Seuil 'bientôt' = {soon_days} jours</p>",
+            "<h2>Sources EOL (référence + date de validité)</h2><ul>",
+        ]
+        for prod, m in meta_by_product.items():
+            parts.append(
+                f"<li>{_esc(prod)} — source: {_esc(m.source)} — fetch: {_esc(m.fetched_at_iso)} — mode: {_esc(m.api_mode)}"
+                f" — cache: {_esc(m.cache or 'n/a')} — {_esc(m.fetch_ms if m.fetch_ms is not None else '?')} ms"
+                f" — âge des données: <b>{_esc(_fmt_age(m.age_s))}</b>"
+                f"{' (périmées)' if m.cache in ('stale', 'absent') else ''}</li>"
+            )
+        parts.append("</ul>")
+
+        parts.append("<h2>Résumé</h2><ul>")
+        parts.append(f"<li>OK: {counts['OK']}</li>")
+        parts.append(f"<li>Bientôt EOL: {counts['SOON']}</li>")
+        parts.append(f"<li>EOL: {counts['EOL']}</li>")
+        parts.append(f"<li>Inconnu: {counts['UNKNOWN']}</li>")
+        parts.append("</ul>")
+        horizons = (resolve_stats or {}).get("horizons")
+        if horizons:
+            parts.append("<h2>Projection (composants hors support à J+n)</h2><ul>")
+            parts.extend(f"<li>J+{h}: {n}</li>" for h, n in horizons.items())
+            parts.append("</ul>")
+
+        parts.append("<h2>Par produit</h2>")
+        parts.append("<table><thead><tr><th>Produit/OS</th><th>Total</th><th>OK</th><th>Bientôt EOL</th><th>EOL</th><th>Inconnu</th></tr></thead><tbody>")
+        for prod in sorted(by_product, key=lambda p: (-by_product[p]["EOL"], -by_product[p]["SOON"], p)):
+            agg = by_product[prod]
+            parts.append(
+                f"<tr><td>{_esc(prod)}</td><td>{sum(agg.values())}</td><td class='ok'>{agg['OK']}</td>"
+                f"<td class='soon'>{agg['SOON']}</td><td class='eol'>{agg['EOL']}</td><td class='unk'>{agg['UNKNOWN']}</td></tr>"
+            )
+        parts.append("</tbody></table>")
 
+        with open(out_path, "w", encoding="utf-8", buffering=buffering) as f:
+            f.write("".join(parts))
             if inventory is not None:
                 f.write("<h2>Inventaire réseau (scan)</h2>")
                 f.write("<table><thead><tr><th>IP</th><th>Ports ouverts</th><th>OS probable</th></tr></thead><tbody>")
-                for h in inventory:
-                    f.write("<tr>")
-                    f.write(f"<td>{esc(h['ip'])}</td>")
-                    f.write(f"<td>{esc(','.join(str(p) for p in h['open_ports']))}</td>")
-                    f.write(f"<td>{esc(h['os_guess'])}</td>")
-                    f.write("</tr>")
+                f.write(
+                    "".join(
+                        f"<tr><td>{_esc(h['ip'])}</td><td>{_esc(','.join(str(p) for p in h['open_ports']))}</td><td>{_esc(h['os_guess'])}</td></tr>"
+                        for h in inventory
+                    )
+                )
                 f.write("</tbody></table>")
-
             f.write("<h2>Composants (CSV) + statut support</h2>")
-            f.write("<table><thead><tr><th>Composant</th><th>Produit/OS</th><th>Version</th><th>EOL</th><th>Statut</th></tr></thead><tbody>")
-            for c in components:
-                st = c["support_status"]
-                css = "ok" if st == "OK" else ("soon" if st == "SOON" else ("eol" if st == "EOL" else "unk"))
-                f.write(f"<tr class='{css}'>")
-                f.write(f"<td>{esc(c['name'])}</td>")
-                f.write(f"<td>{esc(c['product'])}</td>")
-                f.write(f"<td>{esc(c['version'])}</td>")
-                f.write(f"<td>{esc(c.get('eol_date') or '')}</td>")
-                f.write(f"<td><b>{esc(st)}</b></td>")
-                f.write("</tr>")
-            f.write("</tbody></table>")
-
+            if page_paths:
+                f.write(f"<p class='pager'>{sum(counts.values())} composant(s) en {len(page_paths)} page(s) : ")
+                f.write(
+                    " ".join(f"<a href='{pages_dir.name}/{Path(p).name}'>{n}</a>" for n, p in enumerate(page_paths, 1))
+                )
+                f.write("</p>")
+            else:
+                f.write("<p>Aucun composant.</p>")
             f.write("</body></html>")
 
-        return {"counts": counts, "report_path": out_path}
+        return {"counts": counts, "report_path": out_path, "pages": page_paths, "by_product": by_product}
+
+    def _run_scan_opts(self, kwargs: Dict[str, Any], ts: str, artifacts: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Options de _scan_range pour un scan lancé par run_action (scan_range et
+        csv_to_report --scan) : options explicites + flux NDJSON (NTL_SCAN_STREAM),
+        cache des hôtes (NTL_SCAN_CACHE, actif par défaut) et checkpoint
+        (NTL_SCAN_CHECKPOINT_INTERVAL > 0, hors since / shards / agents).
+        """
+        opts = _scan_opts(kwargs)
+        stream = kwargs.get("stream")
+        if stream is None:
+            stream = _env_flag("NTL_SCAN_STREAM")
+        if stream:
+            opts["stream_path"] = artifacts["inventory_ndjson"] = f"reports/audit/inventory_{ts}.ndjson"
+        if _env_flag("NTL_SCAN_CACHE", True):
+            opts["cache_path"] = "reports/audit/scan_cache.json"
+        if (
+            float(_env("NTL_SCAN_CHECKPOINT_INTERVAL", "30") or "30") > 0
+            and not opts.get("since")
+            and int(opts.get("shards") or _env("NTL_SCAN_SHARDS", "1") or "1") <= 1
+            and not opts.get("agents")
+        ):
+            opts["checkpoint_path"] = f"reports/audit/scan_{ts}.checkpoint.json"
+        return opts
 
     # ✅ NOUVEAU : version non-interactive pilotée par main.py
     def run_action(self, action: str, **kwargs) -> ModuleResult:
+        try:
+            return self._run_action(action, **kwargs)
+        finally:
+            # Rafraîchissements swr (threads daemon) : attente bornée, la sortie n'est pas retardée au-delà
+            self.provider.wait_refreshes(float(_env("NTL_EOL_REFRESH_WAIT", "2") or "2"))
+
+    def _run_action(self, action: str, **kwargs) -> ModuleResult:
         started = datetime.now().isoformat(timespec="seconds")
         soon_days = int(_env("NTL_EOL_SOON_DAYS", str(kwargs.get("soon_days", 180))) or "180")
+        # Politique EOL : --eol-policy, sinon NTL_EOL_POLICY, sinon audit.eol_policy (cf. config.example.yml)
+        eol_policy = kwargs.get("eol_policy") or _env("NTL_EOL_POLICY") or (self.config.get("audit") or {}).get("eol_policy")
+        if eol_policy:
+            try:
+                self.provider.set_policy(eol_policy)
+            except ValueError as e:
+                return ModuleResult(
+                    module="obsolescence",
+                    status="ERROR",
+                    summary=str(e),
+                    details={"action": action},
+                    started_at=started,
+                ).finish()
+        snapshot = kwargs.get("eol_snapshot") or (self.config.get("audit") or {}).get("eol_snapshot") or _env("NTL_EOL_SNAPSHOT")
+        if snapshot and action != "eol_snapshot_build":
+            try:
+                self.provider.load_snapshot(str(snapshot))
+            except (OSError, ValueError) as e:
+                return ModuleResult(
+                    module="obsolescence",
+                    status="ERROR",
+                    summary=f"Snapshot EOL illisible: {e}",
+                    details={"action": action, "eol_snapshot": str(snapshot)},
+                    started_at=started,
+                ).finish()
 
         # 1) Scan
         if action == "scan_range":
             cidr = (kwargs.get("cidr") or "").strip()
+            resume = (kwargs.get("resume") or "").strip()
+            if resume and not cidr:
+                try:
+                    cidr = _load_checkpoint(resume)["cidr"]
+                except ValueError as e:
+                    return ModuleResult(
+                        module="obsolescence",
+                        status="ERROR",
+                        summary=str(e),
+                        details={"action": action, "resume": resume},
+                        started_at=started,
+                    ).finish()
             if not cidr:
                 return ModuleResult(
                     module="obsolescence",
@@ -375,22 +1886,102 @@ class AuditObsolescenceModule:
                     started_at=started,
                 ).finish()
 
-            inventory, stats = self._scan_range(cidr)
+            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+            out_inv = f"reports/audit/inventory_{ts}.json"
+            artifacts: Dict[str, str] = {}
+            opts = self._run_scan_opts(kwargs, ts, artifacts)
+            if resume:
+                # Le checkpoint repris est celui mis à jour, puis supprimé en fin de scan
+                opts["resume"] = opts["checkpoint_path"] = resume
+
+            try:
+                inventory, stats = self._scan_range(cidr, **opts)
+            except (ValueError, OSError) as e:
+                return ModuleResult(
+                    module="obsolescence",
+                    status="ERROR",
+                    summary=str(e),
+                    details={"action": action, "cidr": cidr},
+                    artifacts={k: v for k, v in {"checkpoint": opts.get("checkpoint_path") or resume}.items() if v and os.path.exists(v)},
+                    started_at=started,
+                ).finish()
 
             status = "SUCCESS" if inventory else "WARNING"
             summary = f"Scan terminé: {len(inventory)} hôte(s) trouvé(s)" if inventory else "Scan terminé: aucun hôte détecté"
+            details: Dict[str, Any] = {"action": "scan_range", "stats": stats, "inventory": inventory}
+            components = _components_from_inventory(inventory)
+            if components:
+                meta_by_product: Dict[str, EOLMeta] = {}
+                resolve_stats: Dict[str, Any] = {}
+                sample: List[Dict[str, Any]] = []
+                for _ in _sampled(self._resolve_components(components, soon_days, meta_by_product, resolve_stats), sample):
+                    pass
+                details["components"] = sample
+                details["components_truncated"] = resolve_stats["components"] > len(sample)
+                details["resolve"] = resolve_stats
+                details["meta_by_product"] = {k: v.__dict__ for k, v in meta_by_product.items()}
+                bad = resolve_stats["counts"]["EOL"] + resolve_stats["counts"]["SOON"]
+                summary += f" | {resolve_stats['components']} service(s) identifié(s), {bad} EOL/bientôt EOL"
+                if bad:
+                    status = "WARNING"
+            delta = stats.get("delta")
+            if delta:
+                summary += (
+                    f" | delta: +{len(delta['new_hosts'])} nouveau(x), -{len(delta['vanished_hosts'])} disparu(s),"
+                    f" {len(delta['port_changes'])} changement(s) de ports"
+                )
 
-            out_inv = f"reports/audit/inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             _ensure_dir("reports/audit")
             with open(out_inv, "w", encoding="utf-8") as f:
                 json.dump({"stats": stats, "inventory": inventory}, f, indent=2, ensure_ascii=False)
+            artifacts["inventory_json"] = out_inv
 
             return ModuleResult(
                 module="obsolescence",
                 status=status,
                 summary=summary,
-                details={"action": "scan_range", "stats": stats, "inventory": inventory},
-                artifacts={"inventory_json": out_inv},
+                details=details,
+                artifacts=artifacts,
+                started_at=started,
+            ).finish()
+
+        # 1 bis) Agent de scan distribué
+        if action == "scan_agent":
+            controller = (kwargs.get("controller") or _env("NTL_SCAN_CONTROLLER", "") or "").strip()
+            if not controller:
+                return ModuleResult(
+                    module="obsolescence",
+                    status="ERROR",
+                    summary="Adresse du contrôleur manquante pour scan_agent (hôte:port)",
+                    details={"action": action},
+                    started_at=started,
+                ).finish()
+            name = (kwargs.get("name") or _env("NTL_SCAN_AGENT_NAME") or socket.gethostname()).strip()
+            # Sites desservis par cet agent (affinité) : --sites ou NTL_SCAN_AGENT_SITES, vide = tous
+            sites = [t.strip() for t in (kwargs.get("sites") or _env("NTL_SCAN_AGENT_SITES", "") or "").split(",") if t.strip()]
+            try:
+                agent_stats = _run_scan_agent(
+                    controller,
+                    name,
+                    token=_env("NTL_SCAN_AGENT_TOKEN"),
+                    wait_s=float(_env("NTL_SCAN_AGENT_WAIT", "300") or "300"),
+                    sites=sites,
+                    heartbeat_s=float(_env("NTL_SCAN_AGENT_HEARTBEAT", "15") or "15"),
+                )
+            except (OSError, ValueError) as e:
+                return ModuleResult(
+                    module="obsolescence",
+                    status="ERROR",
+                    summary=f"Agent {name}: {e}",
+                    details={"action": action, "controller": controller},
+                    started_at=started,
+                ).finish()
+            return ModuleResult(
+                module="obsolescence",
+                status="SUCCESS" if agent_stats["jobs"] else "WARNING",
+                summary=f"Agent {name} terminé: {agent_stats['jobs']} tranche(s), {agent_stats['hosts']} hôte(s) remonté(s)",
+                details={"action": action, **agent_stats},
+                artifacts={},
                 started_at=started,
             ).finish()
 
@@ -421,6 +2012,8 @@ class AuditObsolescenceModule:
                 any_bad = any(x["support_status"] in ("SOON", "EOL") for x in enriched)
                 status = "WARNING" if any_bad else "SUCCESS"
                 summary = f"Versions/EOL récupérées pour '{product}' (mode {meta.api_mode})"
+            if meta.cache in ("stale", "absent"):
+                summary += f" | données périmées (politique {self.provider.policy}, âge {_fmt_age(meta.age_s)})"
 
             return ModuleResult(
                 module="obsolescence",
@@ -431,6 +2024,38 @@ class AuditObsolescenceModule:
                 started_at=started,
             ).finish()
 
+        # 2b) Snapshot EOL pour les sites isolés
+        if action == "eol_snapshot_build":
+            out_path = (kwargs.get("out") or "reports/audit/eol_snapshot.bin").strip()
+            products = {p.strip().lower() for p in (kwargs.get("products") or []) if p and p.strip()}
+            try:
+                if kwargs.get("all_products"):
+                    products.update(self.provider.list_products())
+                else:
+                    csv_path = (kwargs.get("csv_path") or (self.config.get("audit") or {}).get("components_csv") or "").strip()
+                    if csv_path and (kwargs.get("csv_path") or os.path.exists(csv_path)):
+                        products.update(p for _, p, _ in self._iter_components_csv(csv_path))
+                    # produits que l'étape --banners sait identifier
+                    products.update(prod for _, _, prod in _BANNER_PRODUCTS)
+                info = self._build_eol_snapshot(out_path, sorted(products))
+            except Exception as e:
+                return ModuleResult(
+                    module="obsolescence",
+                    status="ERROR",
+                    summary=f"Construction du snapshot EOL impossible: {e}",
+                    details={"action": action, "out": out_path},
+                    started_at=started,
+                ).finish()
+
+            return ModuleResult(
+                module="obsolescence",
+                status="WARNING" if info["failed"] else "SUCCESS",
+                summary=f"Snapshot EOL: {info['products']} produits, {info['bytes']} octets, {len(info['failed'])} en échec ({info['duration_s']} s)",
+                details={"action": action, **info},
+                artifacts={"eol_snapshot": out_path},
+                started_at=started,
+            ).finish()
+
         # 3) CSV -> EOL + rapport HTML (option scan)
         if action == "csv_to_report":
             csv_path = (kwargs.get("csv_path") or "").strip()
@@ -457,32 +2082,29 @@ class AuditObsolescenceModule:
 
             inventory = None
             inv_stats = None
+            scan_artifacts: Dict[str, str] = {}
             if do_scan:
-                inventory, inv_stats = self._scan_range(cidr)
-
-            components_raw = self._read_components_csv(csv_path)
-
-            by_product: Dict[str, List[Dict[str, str]]] = {}
-            for c in components_raw:
-                by_product.setdefault(c["product"], []).append(c)
-
-            today = datetime.now().date()
-            meta_by_product: Dict[str, EOLMeta] = {}
-            resolved: List[Dict[str, Any]] = []
-
-            for product, comps in by_product.items():
-                rows, meta = self._list_versions_eol(product)
-                meta_by_product[product] = meta
-
-                for c in comps:
-                    match = self._match_cycle(rows, c["version"])
-                    if match:
-                        st, eol_date = _status_from_eol(today, match.get("eol"), soon_days)
-                    else:
-                        st, eol_date = "UNKNOWN", None
-                    resolved.append(
-                        {"name": c["name"], "product": product, "version": c["version"], "eol_date": eol_date, "support_status": st}
-                    )
+                scan_opts = self._run_scan_opts(kwargs, datetime.now().strftime("%Y%m%d_%H%M%S"), scan_artifacts)
+                try:
+                    inventory, inv_stats = self._scan_range(cidr, **scan_opts)
+                except (ValueError, OSError) as e:
+                    return ModuleResult(
+                        module="obsolescence",
+                        status="ERROR",
+                        summary=str(e),
+                        details={"action": action, "csv_path": csv_path, "cidr": cidr},
+                        artifacts={k: v for k, v in {"checkpoint": scan_opts.get("checkpoint_path")}.items() if v and os.path.exists(v)},
+                        started_at=started,
+                    ).finish()
+
+            components_raw = self._iter_components_csv(csv_path)
+            if inventory:
+                components_raw = chain(components_raw, _components_from_inventory(inventory))
+
+            meta_by_product = {}
+            resolve_stats = {}
+            sample = []
+            resolved = _sampled(self._resolve_components(components_raw, soon_days, meta_by_product, resolve_stats), sample)
 
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             out_html = f"reports/audit/audit_report_{ts}.html"
@@ -492,18 +2114,25 @@ class AuditObsolescenceModule:
                 out_path=out_html,
                 meta_by_product=meta_by_product,
                 soon_days=soon_days,
+                resolve_stats=resolve_stats,
             )
 
-            any_eol = any(r["support_status"] == "EOL" for r in resolved)
-            any_soon = any(r["support_status"] == "SOON" for r in resolved)
-            any_unknown = any(r["support_status"] == "UNKNOWN" for r in resolved)
-
-            if any_eol or any_soon or any_unknown:
+            counts = resolve_stats["counts"]
+            if counts["EOL"] or counts["SOON"] or counts["UNKNOWN"]:
                 status = "WARNING"
                 summary = "Audit terminé: composants EOL/SOON/UNKNOWN détectés"
             else:
                 status = "SUCCESS"
                 summary = "Audit terminé: aucun composant EOL/SOON"
+            summary += (
+                f" | {resolve_stats['unique_pairs']} paire(s) produit/version unique(s) pour"
+                f" {resolve_stats['components']} composant(s) (x{resolve_stats['dedupe_ratio']}),"
+                f" résolution {resolve_stats['resolve_ms']} ms, {resolve_stats['rows_per_s']} lignes/s"
+                f" | EOL à {'/'.join(str(h) for h in EOL_HORIZONS)} j: {'/'.join(str(n) for n in resolve_stats['horizons'].values())}"
+            )
+            stale = sorted(k for k, m in meta_by_product.items() if m.cache in ("stale", "absent"))
+            if stale:
+                summary += f" | données EOL périmées ({self.provider.policy}): {', '.join(stale)}"
 
             return ModuleResult(
                 module="obsolescence",
@@ -514,11 +2143,14 @@ class AuditObsolescenceModule:
                     "csv_path": csv_path,
                     "scan": {"enabled": do_scan, "stats": inv_stats, "inventory_count": (len(inventory) if inventory else 0)},
                     "meta_by_product": {k: v.__dict__ for k, v in meta_by_product.items()},
-                    "components": resolved,
+                    "components": sample,
+                    "components_truncated": resolve_stats["components"] > len(sample),
+                    "resolve": resolve_stats,
                     "report": report_info,
                     "soon_days": soon_days,
+                    "eol_policy": self.provider.policy,
                 },
-                artifacts={"audit_report_html": out_html},
+                artifacts={"audit_report_html": out_html, **scan_artifacts},
                 started_at=started,
             ).finish()
 
@@ -557,3 +2189,12 @@ class AuditObsolescenceModule:
             details={"action": "exit"},
             artifacts={},
         ).finish()
+
+
+def _scan_shard(
+    config: Dict[str, Any], cidr: str, shard: Tuple[int, int], opts: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    # Point d'entrée d'un processus de _scan_sharded (fonction de module : picklable)
+    inventory, stats = AuditObsolescenceModule(config)._scan_range(cidr, shard=shard, budget_share=shard[1], **opts)
+    stats["shard"]["pid"] = os.getpid()
+    return inventory, stats
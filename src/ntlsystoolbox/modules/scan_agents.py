@@ -0,0 +1,402 @@
+# src/ntlsystoolbox/modules/scan_agents.py
+# Scan distribué de l'audit d'obsolescence : protocole contrôleur / agents (une ligne
+# JSON par message), les tranches étant scannées par AuditObsolescenceModule._scan_range.
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import json
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+# ----------------------------
+# Scan distribué (contrôleur / agents)
+# ----------------------------
+AGENT_PORT = 7070
+# Seules options de scan qu'un agent accepte du contrôleur : aucun chemin de fichier
+# (checkpoint, cache, flux) ne doit pouvoir être imposé à distance.
+AGENT_OPTION_KEYS = ("engine", "discovery", "adaptive", "rate", "site_rate", "profile")
+AGENT_AUDIT_KEYS = ("scan_profile", "scan_profiles")
+# Champs obligatoires des stats d'une tranche (lus par _merge_shards) -> types admis
+AGENT_RESULT_KEYS = {
+    "cidr": (str,),
+    "found_hosts": (int,),
+    "probes": (int,),
+    "duration_s": (int, float),
+    "workers": (int,),
+    "timeout_s": (int, float),
+    "engine": (str,),
+    "profile": (dict,),
+}
+# Retour de _AgentController._take : pas encore de tranche, relancer après un ping
+_WAIT = -1
+
+
+def _agent_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    # Sous-ensemble de configuration utile au scan d'une tranche (sites + profils de ports)
+    audit_cfg = config.get("audit") or {}
+    return {
+        "networks": dict(config.get("networks") or {}),
+        "audit": {k: audit_cfg[k] for k in AGENT_AUDIT_KEYS if k in audit_cfg},
+    }
+
+
+def _split_hostport(addr: str, default_port: int = AGENT_PORT) -> Tuple[str, int]:
+    host, sep, port = addr.strip().rpartition(":")
+    if not sep:
+        return addr.strip(), default_port
+    try:
+        return host.strip("[]") or "0.0.0.0", int(port)
+    except ValueError:
+        raise ValueError(f"Adresse invalide (attendu hôte:port): {addr}") from None
+
+
+def _send_msg(f: Any, msg: Dict[str, Any]) -> None:
+    f.write(json.dumps(msg, ensure_ascii=False).encode("utf-8") + b"\n")
+    f.flush()
+
+
+def _check_host(item: Any) -> Dict[str, Any]:
+    # Hôte remonté par un agent : IPv4 + liste de ports entiers, sinon message rejeté
+    if not isinstance(item, dict) or not isinstance(item.get("ip"), str):
+        raise ValueError("Hôte agent invalide")
+    ipaddress.IPv4Address(item["ip"])
+    ports = item.get("open_ports")
+    if not isinstance(ports, list) or not all(isinstance(p, int) and not isinstance(p, bool) for p in ports):
+        raise ValueError(f"Ports invalides pour {item['ip']}")
+    return item
+
+
+def _check_result(stats: Any) -> Dict[str, Any]:
+    # Stats d'une tranche d'agent : champs lus par _merge_shards présents et typés
+    if not isinstance(stats, dict):
+        raise ValueError("Résultat agent invalide")
+    for key, types in AGENT_RESULT_KEYS.items():
+        v = stats.get(key)
+        if not isinstance(v, types) or isinstance(v, bool):
+            raise ValueError(f"Résultat agent invalide: {key}")
+    skipped = stats["profile"].get("early_skipped", 0)
+    if not isinstance(skipped, int) or isinstance(skipped, bool):
+        raise ValueError("Résultat agent invalide: profile.early_skipped")
+    stats["profile"]["early_skipped"] = skipped
+    shard = stats.get("shard") if isinstance(stats.get("shard"), dict) else {}
+    hosts = shard.get("hosts")
+    stats["shard"] = {"hosts": hosts if isinstance(hosts, int) and not isinstance(hosts, bool) else 0}
+    stats.pop("sites", None)  # une tranche d'agent ne couvre qu'un site
+    return stats
+
+
+def _recv_msg(f: Any) -> Optional[Dict[str, Any]]:
+    line = f.readline()
+    if not line:
+        return None
+    msg = json.loads(line)
+    if not isinstance(msg, dict):
+        raise ValueError("Message agent invalide")
+    return msg
+
+
+class _AgentSink:
+    """Sink de _scan_range côté agent : chaque hôte trouvé part au contrôleur."""
+
+    def __init__(self, send: Any, job: int):
+        self.send = send
+        self.job = job
+        self.count = 0
+
+    def write(self, item: Dict[str, Any]) -> None:
+        self.send({"type": "host", "job": self.job, "item": item})
+        self.count += 1
+
+    def close(self) -> None:
+        pass
+
+
+class _AgentController:
+    """
+    Contrôleur de scan distribué : chaque site de `sites` (nom de la section
+    networks ou CIDR) est découpé en `jobs` tranches (index, nombre) ; les agents
+    se connectent, tirent des tranches et renvoient leurs hôtes au fil de l'eau.
+    Affinité de site : un agent annonce dans "hello" les sites qu'il dessert
+    (liste vide = tous) et ne reçoit que des tranches de ces sites, pour ne pas
+    sonder les autres sites à travers les liens WAN.
+    Protocole (une ligne JSON par message) :
+      agent -> {"type": "hello", "agent", "token", "sites"}, puis {"type": "next"} par tranche
+      contrôleur -> {"type": "job", "job", "cidr", "shard", "config", "opts"} ou {"type": "bye"}
+      agent -> {"type": "host", "job", "item"}*, puis {"type": "result", "job", "stats"}
+    Une tranche n'est validée qu'à son "result" : si l'agent tombe avant, ses
+    hôtes sont ignorés et la tranche est redonnée à un autre agent.
+    Vivacité : chaque côté envoie {"type": "ping"} toutes les `heartbeat_s`
+    secondes (l'agent pendant ses tranches, le contrôleur tant qu'il n'a pas de
+    tranche à donner) ; une connexion muette 4 x `heartbeat_s` (lien WAN à
+    moitié ouvert) est fermée et sa tranche redonnée. Un hôte ou un résultat
+    mal formé (_check_host / _check_result) ferme aussi la connexion.
+    Sécurité : le protocole circule en clair. Sans jeton (NTL_SCAN_AGENT_TOKEN,
+    identique des deux côtés), n'importe quel hôte joignant le port d'écoute
+    peut se déclarer agent et injecter de faux hôtes dans l'inventaire fusionné ;
+    le jeton n'authentifie que l'agent (pas le contrôleur) et reste lisible sur
+    le réseau : à n'utiliser que sur des liens de confiance ou un tunnel (VPN/SSH).
+    """
+
+    def __init__(
+        self,
+        listen: str,
+        sites: List[str],
+        jobs: int,
+        config: Dict[str, Any],
+        opts: Dict[str, Any],
+        token: Optional[str] = None,
+        sink: Optional[Any] = None,
+        heartbeat_s: float = 15.0,
+    ):
+        self.sites = list(sites)
+        self.per_site = jobs
+        # Tranche n° -> (site, index dans le site)
+        self.work: List[Tuple[str, int]] = [(site, i) for site in self.sites for i in range(jobs)]
+        self.jobs = len(self.work)
+        self.config = config
+        self.opts = opts
+        self.token = token
+        self.sink = sink
+        self.heartbeat_s = heartbeat_s
+        self.server = socket.create_server(_split_hostport(listen))
+        self.server.settimeout(0.2)
+        self.address = self.server.getsockname()[:2]
+        self.pending: List[int] = list(range(self.jobs))
+        self.parts: Dict[int, Tuple[List[Dict[str, Any]], Dict[str, Any]]] = {}
+        self.by_agent: Dict[str, int] = {}
+        self.requeued = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+        self._active = 0
+        self._last = time.monotonic()
+        self._closed = False
+
+    def serve(self, wait_s: float) -> List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        acceptor = threading.Thread(target=self._accept_loop, daemon=True)
+        acceptor.start()
+        with self._cond:
+            while len(self.parts) < self.jobs:
+                self._cond.wait(0.2)
+                if not self._active and time.monotonic() - self._last > wait_s:
+                    missing = sorted({self.work[j][0] for j in range(self.jobs) if j not in self.parts})
+                    raise OSError(
+                        f"Aucun agent actif depuis {wait_s:.0f}s ({len(self.parts)}/{self.jobs} tranche(s) reçue(s),"
+                        f" site(s) sans agent: {', '.join(missing)})"
+                    )
+        return [self.parts[i] for i in range(self.jobs)]
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.server.close()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "listen": f"{self.address[0]}:{self.address[1]}",
+            "jobs": self.jobs,
+            "jobs_per_site": self.per_site,
+            "by_agent": dict(self.by_agent),
+            "requeued": self.requeued,
+            "rejected": self.rejected,
+            "token": bool(self.token),
+        }
+
+    def _accept_loop(self) -> None:
+        while not self._closed:
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _take(self, sites: Set[str], wait_s: float) -> Optional[int]:
+        # Prochaine tranche d'un site desservi par l'agent (`sites` vide = tous) ; attend
+        # jusqu'à `wait_s` (puis _WAIT) tant que des tranches de ces sites sont en cours
+        # ailleurs (elles peuvent revenir) ; None s'il n'y a plus rien pour l'agent
+        def serves(job: int) -> bool:
+            return not sites or self.work[job][0] in sites
+
+        deadline = time.monotonic() + wait_s
+        with self._cond:
+            while not self._closed:
+                for job in self.pending:
+                    if serves(job):
+                        self.pending.remove(job)
+                        return job
+                if not any(serves(j) for j in range(self.jobs) if j not in self.parts):
+                    return None
+                if time.monotonic() >= deadline:
+                    return _WAIT
+                self._cond.wait(0.2)
+            return None
+
+    def _handle(self, conn: socket.socket) -> None:
+        conn.settimeout(self.heartbeat_s * 4)
+        f = conn.makefile("rwb")
+        job: Optional[int] = None
+        items: List[Dict[str, Any]] = []
+        with self._cond:
+            self._active += 1
+        try:
+            hello = _recv_msg(f)
+            if not hello or hello.get("type") != "hello" or (
+                self.token and not hmac.compare_digest(str(hello.get("token") or "").encode("utf-8"), self.token.encode("utf-8"))
+            ):
+                with self._cond:
+                    self.rejected += 1
+                _send_msg(f, {"type": "bye", "error": "agent refusé"})
+                return
+            name = str(hello.get("agent") or conn.getpeername()[0])
+            served = {str(site) for site in hello.get("sites") or []}
+            while True:
+                msg = _recv_msg(f)
+                if msg is None:
+                    break
+                kind = msg.get("type")
+                if kind == "next":
+                    job = self._take(served, self.heartbeat_s)
+                    while job == _WAIT:
+                        _send_msg(f, {"type": "ping"})
+                        job = self._take(served, self.heartbeat_s)
+                    if job is None:
+                        _send_msg(f, {"type": "bye"})
+                        break
+                    items = []
+                    site, index = self.work[job]
+                    _send_msg(
+                        f,
+                        {
+                            "type": "job",
+                            "job": job,
+                            "cidr": site,
+                            "shard": [index, self.per_site],
+                            "config": self.config,
+                            "opts": self.opts,
+                        },
+                    )
+                elif kind == "host" and msg.get("job") == job:
+                    item = _check_host(msg.get("item"))
+                    if len(self.sites) > 1:
+                        item["site"] = self.work[job][0]
+                    items.append(item)
+                elif kind == "result" and msg.get("job") == job and job is not None:
+                    stats = _check_result(msg.get("stats"))
+                    site, index = self.work[job]
+                    stats["shard"] = {**stats["shard"], "index": index, "count": self.per_site, "site": site, "agent": name}
+                    with self._cond:
+                        self.parts[job] = (items, stats)
+                        self.by_agent[name] = self.by_agent.get(name, 0) + 1
+                        self._last = time.monotonic()
+                        if self.sink is not None:
+                            for item in items:
+                                self.sink.write(item)
+                        self._cond.notify_all()
+                    job = None
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._last = time.monotonic()
+                if job is not None:
+                    self.pending.insert(0, job)
+                    self.requeued += 1
+                self._cond.notify_all()
+            try:
+                f.close()
+                conn.close()
+            except OSError:
+                pass
+
+
+def _run_scan_agent(
+    controller: str,
+    name: str,
+    token: Optional[str] = None,
+    wait_s: float = 300.0,
+    sites: Optional[List[str]] = None,
+    heartbeat_s: float = 15.0,
+) -> Dict[str, Any]:
+    """
+    Mode agent : se connecte au contrôleur (réessaie jusqu'à `wait_s` secondes),
+    scanne les tranches reçues avec _scan_range et renvoie les hôtes au fil de l'eau.
+    `sites` : sites desservis (noms de la section networks ou CIDR), annoncés au
+    contrôleur qui ne confie que leurs tranches ; vide = tous les sites.
+    Un ping part toutes les `heartbeat_s` secondes (même pendant une tranche) ;
+    un contrôleur muet 4 x `heartbeat_s` coupe la session (OSError).
+    Le contrôleur n'étant pas authentifié, seules les options AGENT_OPTION_KEYS
+    et la configuration de _agent_config sont reprises de ses messages.
+    """
+    # Import tardif : audit_obsolescence importe ce module
+    from ntlsystoolbox.modules.audit_obsolescence import AuditObsolescenceModule
+
+    addr = _split_hostport(controller)
+    deadline = time.monotonic() + wait_s
+    while True:
+        try:
+            conn = socket.create_connection(addr, timeout=10)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+    conn.settimeout(heartbeat_s * 4)
+    f = conn.makefile("rwb")
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def send(msg: Dict[str, Any]) -> None:
+        with lock:
+            _send_msg(f, msg)
+
+    def heartbeat() -> None:
+        while not stop.wait(heartbeat_s):
+            try:
+                send({"type": "ping"})
+            except (OSError, ValueError):
+                return
+
+    done_jobs = hosts = 0
+    t0 = time.monotonic()
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        send({"type": "hello", "agent": name, "token": token, "sites": list(sites or [])})
+        while True:
+            send({"type": "next"})
+            msg = _recv_msg(f)
+            while msg is not None and msg.get("type") == "ping":
+                msg = _recv_msg(f)
+            if msg is None or msg.get("type") != "job":
+                if msg and msg.get("error"):
+                    raise ValueError(msg["error"])
+                break
+            sink = _AgentSink(send, int(msg["job"]))
+            module = AuditObsolescenceModule(_agent_config(msg.get("config") or {}))
+            opts = {k: v for k, v in (msg.get("opts") or {}).items() if k in AGENT_OPTION_KEYS}
+            index, count = (int(x) for x in msg["shard"])
+            _, stats = module._scan_range(str(msg["cidr"]), shard=(index, count), sink=sink, **opts)
+            send({"type": "result", "job": msg["job"], "stats": stats})
+            done_jobs += 1
+            hosts += sink.count
+    finally:
+        stop.set()
+        with lock:
+            f.close()
+        conn.close()
+    return {
+        "controller": f"{addr[0]}:{addr[1]}",
+        "agent": name,
+        "sites": list(sites or []),
+        "jobs": done_jobs,
+        "hosts": hosts,
+        "duration_s": round(time.monotonic() - t0, 3),
+    }
+
@@ -0,0 +1,943 @@
+# src/ntlsystoolbox/modules/scan_engine.py
+# Moteur de scan TCP de l'audit d'obsolescence (connexions threads / asyncio, timeouts
+# adaptatifs, inventaire, cache, checkpoint, débit par site, bannières), orchestré par
+# AuditObsolescenceModule._scan_range.
+from __future__ import annotations
+
+import asyncio
+import errno
+import json
+import os
+import re
+import socket
+import ssl
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+# ----------------------------
+# Helpers (partagés avec audit_obsolescence)
+# ----------------------------
+def _ensure_dir(path: str) -> None:
+    Path(path).mkdir(parents=True, exist_ok=True)
+
+
+# ----------------------------
+# Sondes TCP, inventaire, cache, checkpoint et débit
+# ----------------------------
+# Erreurs locales (saturation de la machine qui scanne, pas réponse de la cible)
+_LOCAL_ERRNOS = {
+    getattr(errno, name) for name in ("ENOBUFS", "EMFILE", "ENFILE", "EADDRNOTAVAIL", "EAGAIN") if hasattr(errno, name)
+}
+
+
+def _tcp_connect(host: str, port: int, timeout_s: float = 0.5) -> Tuple[str, float]:
+    """
+    Retourne (état, durée_s) : "open" (connexion acceptée), "closed" (RST :
+    l'hôte répond mais le port est fermé), "filtered" (timeout / injoignable)
+    ou "error" (ressource locale épuisée : ENOBUFS, EMFILE...).
+    """
+    t0 = time.monotonic()
+    try:
+        with socket.create_connection((host, port), timeout=timeout_s):
+            return "open", time.monotonic() - t0
+    except ConnectionRefusedError:
+        return "closed", time.monotonic() - t0
+    except OSError as e:
+        return ("error" if e.errno in _LOCAL_ERRNOS else "filtered"), time.monotonic() - t0
+    except Exception:
+        return "filtered", time.monotonic() - t0
+
+
+async def _tcp_connect_async(host: str, port: int, timeout_s: float) -> Tuple[str, float]:
+    """
+    Connect TCP non bloquant (boucle asyncio), même contrat que _tcp_connect.
+    """
+    t0 = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=timeout_s)
+    except ConnectionRefusedError:
+        return "closed", time.monotonic() - t0
+    except OSError as e:
+        return ("error" if e.errno in _LOCAL_ERRNOS else "filtered"), time.monotonic() - t0
+    except Exception:
+        return "filtered", time.monotonic() - t0
+    rtt = time.monotonic() - t0
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return "open", rtt
+
+
+class _AdaptiveTimeout:
+    """
+    Timeout de connexion d'un sous-réseau. En mode adaptatif, on démarre au plafond
+    (un lien lent doit pouvoir répondre), on mesure le RTT des premières réponses
+    (open/closed) puis timeout = p99 x k, borné [floor, ceil].
+    """
+
+    def __init__(self, base_s: float, adaptive: bool = False, k: float = 3.0, floor_s: float = 0.05,
+                 ceil_s: float = 2.0, warmup: int = 5, max_samples: int = 64):
+        self.adaptive = adaptive
+        self.k = k
+        self.floor_s = floor_s
+        self.ceil_s = max(ceil_s, floor_s)
+        self.warmup = max(1, warmup)
+        self.max_samples = max(self.warmup, max_samples)
+        self.samples: List[float] = []
+        self.value = self.ceil_s if adaptive else base_s
+
+    def observe(self, state: str, rtt_s: float) -> None:
+        if not self.adaptive or state not in ("open", "closed") or len(self.samples) >= self.max_samples:
+            return
+        self.samples.append(rtt_s)
+        if len(self.samples) >= self.warmup:
+            self.value = min(self.ceil_s, max(self.floor_s, self._pct(0.99) * self.k))
+
+    def _pct(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        d: Dict[str, Any] = {"timeout_s": round(self.value, 4), "adaptive": self.adaptive}
+        if self.adaptive:
+            d["rtt_samples"] = len(self.samples)
+            if self.samples:
+                d["rtt_p50_ms"] = round(self._pct(0.5) * 1000, 2)
+                d["rtt_p99_ms"] = round(self._pct(0.99) * 1000, 2)
+        return d
+
+
+def _ip_int(ip: str) -> int:
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+def _int_ip(n: int) -> str:
+    return socket.inet_ntoa(struct.pack("!I", n))
+
+
+def _iter_hosts(net: Any) -> range:
+    # Équivalent de net.hosts() en entiers 32 bits, sans objet par adresse
+    first, last = int(net.network_address), int(net.broadcast_address)
+    if net.prefixlen >= 31:
+        return range(first, last + 1)
+    return range(first + 1, last)
+
+
+def _host_port_pairs(
+    hosts: Iterable[int], ports: List[int], early: Optional["_HostCollector"] = None
+) -> Iterator[Tuple[str, int]]:
+    # Ordre hôte-major : les ports d'un même hôte partent ensemble (par priorité).
+    # Avec `early`, les ports restants d'un hôte dont l'OS est déjà tranché sont sautés.
+    for ip in hosts:
+        host = _int_ip(ip)
+        for i, p in enumerate(ports):
+            if early is not None and early.decided(host):
+                early.skip(host, len(ports) - i)
+                break
+            yield host, p
+
+
+def _read_arp_table(path: str = "/proc/net/arp") -> List[str]:
+    """
+    Table de voisinage du noyau (Linux) : IPs dont l'adresse MAC est résolue.
+    Colonnes: IP address, HW type, Flags, HW address, Mask, Device
+    """
+    ips: List[str] = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            next(f, None)
+            for line in f:
+                cols = line.split()
+                if len(cols) >= 4 and cols[2] != "0x0" and cols[3] != "00:00:00:00:00:00":
+                    ips.append(cols[0])
+    except Exception:
+        pass
+    return ips
+
+
+class _AliveCollector:
+    """
+    Phase 1 (découverte) : retient les hôtes ayant répondu à la sonde de liveness.
+    Avec un `tracker`, chaque sonde reçue fait avancer le suivi des blocs
+    entièrement sondés (une sonde par adresse).
+    """
+
+    def __init__(self, tracker: Optional["_BlockTracker"] = None) -> None:
+        self.probes = 0
+        self.last_t: Optional[float] = None
+        self.alive: Set[str] = set()
+        self.tracker = tracker
+
+    def add(self, host: str, port: int, is_alive: bool) -> None:
+        self.probes += 1
+        self.last_t = time.monotonic()
+        if is_alive:
+            self.alive.add(host)
+        if self.tracker is not None:
+            self.tracker.finish(_ip_int(host))
+
+
+class _CompactInventory:
+    """
+    Inventaire compact : adresses IPv4 en entiers 32 bits (array "I"), ports
+    ouverts en masque de bits sur la liste des ports sondés, site en index.
+    Les dicts {"ip", "open_ports", "os_guess"[, "site"]} ne sont produits qu'à
+    la sérialisation ; le tri se fait sur les entiers.
+    """
+
+    def __init__(self, ports: List[int], sites: Optional[List[str]] = None):
+        self.ports = list(ports)
+        self.sites = list(sites or [])
+        self._bit = {p: 1 << i for i, p in enumerate(self.ports)}
+        self._by_port = sorted(range(len(self.ports)), key=self.ports.__getitem__)
+        self.ips = array("I")
+        self.masks: Any = array("Q") if len(self.ports) <= 64 else []
+        self.site_idx = array("H")
+
+    def __len__(self) -> int:
+        return len(self.ips)
+
+    def mask_of(self, open_ports: Iterable[int]) -> int:
+        mask = 0
+        for p in open_ports:
+            mask |= self._bit.get(p, 0)
+        return mask
+
+    def ports_of(self, mask: int) -> List[int]:
+        return [self.ports[i] for i in self._by_port if mask >> i & 1]
+
+    def add(self, ip: int, mask: int, site_idx: int = 0) -> None:
+        self.ips.append(ip)
+        self.masks.append(mask)
+        self.site_idx.append(site_idx)
+
+    def add_dict(self, item: Dict[str, Any]) -> None:
+        site = item.get("site")
+        if site is not None and site not in self.sites:
+            self.sites.append(site)
+        self.add(_ip_int(item["ip"]), self.mask_of(item.get("open_ports") or []), self.sites.index(site) if site is not None else 0)
+
+    def sort(self) -> None:
+        order = sorted(range(len(self.ips)), key=self.ips.__getitem__)
+        masks = [self.masks[i] for i in order]
+        self.ips = array("I", (self.ips[i] for i in order))
+        self.masks = array("Q", masks) if isinstance(self.masks, array) else masks
+        self.site_idx = array("H", (self.site_idx[i] for i in order))
+
+    def item(self, ip: int, mask: int, site_idx: int = 0) -> Dict[str, Any]:
+        open_ports = self.ports_of(mask)
+        d: Dict[str, Any] = {"ip": _int_ip(ip), "open_ports": open_ports, "os_guess": _guess_os_from_ports(open_ports)}
+        if self.sites:
+            d["site"] = self.sites[site_idx]
+        return d
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [self.item(ip, mask, si) for ip, mask, si in zip(self.ips, self.masks, self.site_idx)]
+
+
+class _HostCollector:
+    """
+    Agrège les sondes (hôte, port) : un hôte est finalisé dès que tous ses ports
+    ont répondu, et n'est retenu que s'il a au moins un port ouvert.
+    Avec un `sink`, chaque hôte finalisé y est écrit immédiatement au lieu d'être
+    gardé dans l'inventaire compact. Avec un `tracker`, chaque hôte finalisé
+    (ouvert ou non) fait avancer le suivi des blocs pour le checkpoint.
+    Avec `early_os`, un hôte est "tranché" dès que les ports restants ne peuvent
+    plus changer _guess_os_from_ports (voir _host_port_pairs). Avec un `cache`,
+    chaque hôte sondé y est enregistré (voir _ScanCache).
+    """
+
+    def __init__(
+        self,
+        inventory: _CompactInventory,
+        site_idx: int = 0,
+        sink: Optional["_NdjsonSink"] = None,
+        tracker: Optional["_BlockTracker"] = None,
+        early_os: bool = False,
+    ):
+        self.inventory = inventory
+        self.nports = len(inventory.ports)
+        self.site_idx = site_idx
+        self.sink = sink
+        self.tracker = tracker
+        self.early_os = early_os
+        self.probes = 0
+        self.found = 0
+        self.skipped = 0
+        self.last_t: Optional[float] = None
+        self._pending: Dict[str, List[int]] = {}  # host -> [restant, masque ouverts, masque répondus]
+        self._decided: Set[str] = set()
+        self.cache: Optional["_ScanCache"] = None
+
+    def add(self, host: str, port: int, is_open: bool) -> None:
+        self.probes += 1
+        self.last_t = time.monotonic()
+        st = self._pending.get(host)
+        if st is None:
+            st = self._pending[host] = [self.nports, 0, 0]
+        bit = self.inventory._bit.get(port, 0)
+        if is_open:
+            st[1] |= bit
+        st[2] |= bit
+        st[0] -= 1
+        if st[0] > 0:
+            if self.early_os and is_open and host not in self._decided:
+                unanswered = [p for p in self.inventory.ports if not st[2] & self.inventory._bit[p]]
+                if _os_guess_final(self.inventory.ports_of(st[1]), unanswered):
+                    self._decided.add(host)
+            return
+        self._finish(host, st[1])
+
+    def add_cached(self, ip: int, open_ports: List[int]) -> None:
+        # Hôte servi par le cache : finalisé sans sonde (et sans ré-écriture du cache)
+        self._finish(_int_ip(ip), self.inventory.mask_of(open_ports), cached=True)
+
+    def decided(self, host: str) -> bool:
+        return host in self._decided
+
+    def skip(self, host: str, count: int) -> None:
+        # Ports jamais envoyés : comptés comme répondus (fermés) pour finaliser l'hôte
+        self.skipped += count
+        st = self._pending[host]
+        st[0] -= count
+        if st[0] <= 0:
+            self._finish(host, st[1])
+
+    def _finish(self, host: str, mask: int, cached: bool = False) -> None:
+        # Hôtes sondés mis en cache, y compris ceux arrêtés tôt (early_os) : même
+        # profil de ports => même décision au prochain scan
+        if self.cache is not None and not cached:
+            self.cache.put(_ip_int(host), self.inventory.ports_of(mask))
+        self._pending.pop(host, None)
+        self._decided.discard(host)
+        if mask:
+            self.found += 1
+            if self.sink is not None:
+                self.sink.write(self.inventory.item(_ip_int(host), mask, self.site_idx))
+            else:
+                self.inventory.add(_ip_int(host), mask, self.site_idx)
+        if self.tracker is not None:
+            self.tracker.finish(_ip_int(host))
+
+
+class _NdjsonSink:
+    """
+    Inventaire en flux : une ligne JSON par hôte, flushée à l'écriture, pour qu'un
+    scan interrompu laisse un fichier exploitable.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        _ensure_dir(str(Path(path).parent))
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, item: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def _read_ndjson(path: str) -> List[Dict[str, Any]]:
+    # Tolère une dernière ligne tronquée (scan tué pendant l'écriture)
+    items: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(obj, dict) and obj.get("ip"):
+                items.append(obj)
+    return items
+
+
+def _load_inventory(path: str) -> List[Dict[str, Any]]:
+    """
+    Relit un inventaire produit par scan_range : inventory_*.json ({"stats", "inventory"})
+    ou inventory_*.ndjson (une ligne par hôte).
+    """
+    if path.endswith(".ndjson"):
+        return _read_ndjson(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    inv = data.get("inventory") if isinstance(data, dict) else data
+    if not isinstance(inv, list):
+        raise ValueError(f"Inventaire illisible (clé 'inventory' absente): {path}")
+    return [h for h in inv if isinstance(h, dict) and h.get("ip")]
+
+
+def _diff_pairs(
+    known: List[Dict[str, Any]], rest: Iterable[int], ports: List[int], counter: Dict[str, int]
+) -> Iterator[Tuple[str, int]]:
+    """
+    Re-scan différentiel : d'abord les hôtes connus (leurs ports connus en tête),
+    puis le reste de la plage, en priorité basse.
+    """
+    for h in known:
+        prev = [p for p in ports if p in (h.get("open_ports") or [])]
+        for p in prev + [p for p in ports if p not in prev]:
+            yield h["ip"], p
+    for ip in rest:
+        counter["swept_unknown"] += 1
+        host = _int_ip(ip)
+        for p in ports:
+            yield host, p
+
+
+def _inventory_delta(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Dict[str, Any]:
+    prev = {h["ip"]: h for h in previous}
+    cur = {h["ip"]: h for h in current}
+    changes: List[Dict[str, Any]] = []
+    for ip in sorted(set(prev) & set(cur), key=_ip_int):
+        before = set(prev[ip].get("open_ports") or [])
+        after = set(cur[ip].get("open_ports") or [])
+        if before != after:
+            changes.append({"ip": ip, "opened": sorted(after - before), "closed": sorted(before - after)})
+    return {
+        "previous_hosts": len(prev),
+        "new_hosts": sorted(set(cur) - set(prev), key=_ip_int),
+        "vanished_hosts": sorted(set(prev) - set(cur), key=_ip_int),
+        "port_changes": changes,
+        "unchanged_hosts": len(set(prev) & set(cur)) - len(changes),
+    }
+
+
+class _ScanCache:
+    """
+    Cache par IP des résultats de scan (ports ouverts + OS probable), rangé à
+    côté du cache EOL (reports/audit/). Une entrée sert tant qu'elle a moins de `ttl_s`
+    secondes et qu'elle a été obtenue avec la même liste de ports ; au-delà de
+    `max_entries`, les entrées les moins récemment utilisées sont évincées (LRU).
+    Les hôtes sans port ouvert sont aussi mis en cache : ce sont eux qui coûtent
+    un timeout à chaque scan. `refresh` ignore les entrées existantes (mais
+    enregistre les nouveaux résultats).
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, ttl_s: float, max_entries: int, ports: List[int], refresh: bool = False):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max(1, max_entries)
+        self.ports_key = ",".join(str(p) for p in sorted(ports))
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == self.VERSION:
+                for ip, entry in data.get("entries") or []:
+                    self._entries[ip] = entry
+        except Exception:
+            pass
+
+    def _usable(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return not (
+            entry is None
+            or self.refresh
+            or entry.get("ports_key") != self.ports_key
+            or time.time() - float(entry.get("scanned_at", 0)) > self.ttl_s
+        )
+
+    def fresh(self, ip: int) -> bool:
+        # Consultation sans effet (ni compteurs ni LRU) : la découverte écarte ces hôtes
+        return self._usable(self._entries.get(_int_ip(ip)))
+
+    def get(self, ip: int) -> Optional[List[int]]:
+        key = _int_ip(ip)
+        entry = self._entries.get(key)
+        if not self._usable(entry):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry.get("open_ports") or [])
+
+    def put(self, ip: int, open_ports: List[int]) -> None:
+        key = _int_ip(ip)
+        self._entries[key] = {
+            "open_ports": open_ports,
+            "os_guess": _guess_os_from_ports(open_ports),
+            "ports_key": self.ports_key,
+            "scanned_at": round(time.time(), 3),
+        }
+        self._entries.move_to_end(key)
+        self.stored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def filter(self, hosts: Iterable[int], collector: "_HostCollector") -> Iterator[int]:
+        # Les hôtes servis par le cache sont finalisés tout de suite, les autres sondés
+        for ip in hosts:
+            open_ports = self.get(ip)
+            if open_ports is None:
+                yield ip
+            else:
+                collector.add_cached(ip, open_ports)
+
+    def save(self) -> None:
+        try:
+            _ensure_dir(str(Path(self.path).parent))
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "entries": list(self._entries.items())}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "refresh": self.refresh,
+            "ttl_s": self.ttl_s,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "entries": len(self._entries),
+        }
+
+
+class _BlockTracker:
+    """
+    Suivi de progression par blocs d'adresses alignés (ip // block_size) pour
+    la reprise. Un bloc est terminé quand l'énumération l'a dépassé et que tous
+    les hôtes émis ont reçu toutes leurs sondes. L'énumération doit être
+    croissante (plage ou liste triée de la découverte).
+    """
+
+    def __init__(self, block_size: int, done: Iterable[int] = (), checkpoint: Optional["_Checkpoint"] = None):
+        self.block_size = max(1, block_size)
+        self.done: Set[int] = set(done)
+        self.resumed = len(self.done)
+        self.checkpoint = checkpoint
+        self.skipped = 0
+        self._emitted: Dict[int, int] = {}
+        self._finished: Dict[int, int] = {}
+        self._current: Optional[int] = None  # bloc en cours d'énumération
+
+    def is_done(self, ip: int) -> bool:
+        return ip // self.block_size in self.done
+
+    def feed(self, hosts: Iterable[int]) -> Iterator[int]:
+        for ip in hosts:
+            b = ip // self.block_size
+            if b in self.done:
+                self.skipped += 1
+                continue
+            if b != self._current:
+                self._close()
+                self._current = b
+            self._emitted[b] = self._emitted.get(b, 0) + 1
+            yield ip
+        self._close()
+
+    def mark_done(self, blocks: Iterable[int]) -> None:
+        # Blocs clos hors balayage (découverte : tout sondé, aucun hôte vivant)
+        new = set(blocks) - self.done
+        if new:
+            self.done |= new
+            if self.checkpoint is not None:
+                self.checkpoint.tick()
+
+    def finish(self, ip: int) -> None:
+        b = ip // self.block_size
+        self._finished[b] = self._finished.get(b, 0) + 1
+        if b != self._current:
+            self._check(b)
+
+    def _close(self) -> None:
+        b, self._current = self._current, None
+        if b is not None:
+            self._check(b)
+
+    def _check(self, b: int) -> None:
+        if self._finished.get(b, 0) < self._emitted.get(b, 1):
+            return
+        self.done.add(b)
+        self._emitted.pop(b, None)
+        self._finished.pop(b, None)
+        if self.checkpoint is not None:
+            self.checkpoint.tick()
+
+
+class _Checkpoint:
+    """
+    Point de reprise d'un scan : blocs terminés par site + hôtes trouvés jusque-là,
+    réécrit au plus toutes les `interval_s` secondes (écriture atomique : fichier
+    temporaire puis os.replace), et systématiquement si le scan est interrompu.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        path: str,
+        interval_s: float,
+        cidr: str,
+        ports: List[int],
+        block_size: int,
+        inventory: _CompactInventory,
+        stream_path: Optional[str] = None,
+    ):
+        self.path = path
+        self.interval_s = interval_s
+        self.cidr = cidr
+        self.ports = ports
+        self.block_size = block_size
+        self.inventory = inventory
+        self.stream_path = stream_path
+        self.trackers: Dict[str, _BlockTracker] = {}
+        self.saves = 0
+        self._last = time.monotonic()
+
+    def tick(self) -> None:
+        if self.interval_s > 0 and time.monotonic() - self._last >= self.interval_s:
+            self.save()
+
+    def save(self) -> None:
+        data = {
+            "version": self.VERSION,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "cidr": self.cidr,
+            "ports": self.ports,
+            "block_size": self.block_size,
+            "done": {site: sorted(t.done) for site, t in self.trackers.items()},
+            "stream_path": self.stream_path,
+            "inventory": self.inventory.to_dicts(),
+        }
+        _ensure_dir(str(Path(self.path).parent))
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.saves += 1
+        self._last = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "interval_s": self.interval_s,
+            "block_size": self.block_size,
+            "saves": self.saves,
+            "blocks_done": sum(len(t.done) for t in self.trackers.values()),
+            "resumed_blocks": sum(t.resumed for t in self.trackers.values()),
+            "skipped_hosts": sum(t.skipped for t in self.trackers.values()),
+        }
+
+
+def _load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Checkpoint illisible: {path} ({e})") from None
+    if not isinstance(data, dict) or data.get("version") != _Checkpoint.VERSION or not data.get("cidr"):
+        raise ValueError(f"Checkpoint invalide: {path}")
+    return data
+
+
+def _ip_sort_key(item: Dict[str, Any]) -> int:
+    return _ip_int(item["ip"])
+
+
+class _TokenBucket:
+    """
+    Seau à jetons (GCRA) : `reserve()` réserve le prochain créneau et renvoie
+    l'attente à respecter avant d'envoyer la sonde. Thread-safe.
+    """
+
+    def __init__(self, rate_pps: float, burst: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._tat = 0.0
+        self.burst = max(1, burst if burst is not None else int(rate_pps / 10))
+        self.rate_pps = rate_pps
+
+    def set_rate(self, rate_pps: float) -> None:
+        with self._lock:
+            self.rate_pps = max(0.1, rate_pps)
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            interval = 1.0 / self.rate_pps
+            tat = max(self._tat, now)
+            wait_s = max(0.0, tat - (self.burst - 1) * interval - now)
+            self._tat = tat + interval
+            return wait_s
+
+
+class _RateGovernor:
+    """
+    Débit des sondes : seau global + un seau par sous-réseau cible.
+    Recul automatique (AIMD) : si la part d'erreurs locales (ENOBUFS, EMFILE...)
+    dépasse `error_ratio` sur une fenêtre de sondes, le débit est divisé par 2
+    (à défaut de limite configurée, on part du débit observé) ; chaque fenêtre
+    propre le remonte de 10 % de la limite configurée.
+    """
+
+    def __init__(self, rate_pps: Optional[float], site_rate_pps: Optional[float], window: int = 200, error_ratio: float = 0.02):
+        self._lock = threading.Lock()
+        self.base_rate = rate_pps or None
+        self.base_site_rate = site_rate_pps or None
+        self.factor = 1.0
+        self.window = max(1, window)
+        self.error_ratio = error_ratio
+        self.global_bucket = _TokenBucket(self.base_rate) if self.base_rate else None
+        self.site_buckets: Dict[str, _TokenBucket] = {}
+        self.throttle_s: Dict[str, float] = {}
+        self.backoffs = 0
+        self.local_errors = 0
+        self._n = 0
+        self._err = 0
+        self._window_t0 = time.monotonic()
+
+    def delay(self, site: str) -> float:
+        wait_s = 0.0
+        if self.global_bucket is not None:
+            wait_s = self.global_bucket.reserve()
+        if self.base_site_rate:
+            with self._lock:
+                bucket = self.site_buckets.get(site)
+                if bucket is None:
+                    bucket = self.site_buckets[site] = _TokenBucket(self.base_site_rate * self.factor)
+            wait_s = max(wait_s, bucket.reserve())
+        if wait_s > 0:
+            with self._lock:
+                self.throttle_s[site] = self.throttle_s.get(site, 0.0) + wait_s
+        return wait_s
+
+    def record(self, state: str) -> None:
+        with self._lock:
+            self._n += 1
+            if state == "error":
+                self._err += 1
+                self.local_errors += 1
+            if self._n < self.window:
+                return
+            now = time.monotonic()
+            if self._err / self._n > self.error_ratio:
+                self.backoffs += 1
+                if self.base_rate is None:
+                    self.base_rate = max(1.0, self._n / max(now - self._window_t0, 1e-3))
+                    self.global_bucket = _TokenBucket(self.base_rate)
+                self.factor = max(1 / 64, self.factor / 2)
+            elif self.factor < 1.0:
+                self.factor = min(1.0, self.factor + 0.1)
+            self._n = self._err = 0
+            self._window_t0 = now
+            if self.global_bucket is not None and self.base_rate:
+                self.global_bucket.set_rate(self.base_rate * self.factor)
+            for bucket in self.site_buckets.values():
+                bucket.set_rate((self.base_site_rate or 0.1) * self.factor)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "global_pps": self.base_rate,
+            "site_pps": self.base_site_rate,
+            "effective_global_pps": round(self.base_rate * self.factor, 1) if self.base_rate else None,
+            "effective_site_pps": round(self.base_site_rate * self.factor, 1) if self.base_site_rate else None,
+            "factor": round(self.factor, 4),
+            "backoffs": self.backoffs,
+            "local_errors": self.local_errors,
+            "throttle_s": round(sum(self.throttle_s.values()), 3),
+        }
+
+
+def _paced_connect(lane: "_Lane", host: str, port: int) -> Tuple[str, float]:
+    # Exécuté dans le pool : l'attente du seau occupe le slot, le débit reste exact
+    if lane.governor is not None:
+        wait_s = lane.governor.delay(lane.name)
+        if wait_s > 0:
+            time.sleep(wait_s)
+    return _tcp_connect(host, port, lane.timeout_for(port))
+
+
+class _Lane:
+    """
+    File de sondes d'une cible (site) : paires (hôte, port), collecteur et plafond
+    de sondes en vol propre à la cible (un lien WAN lent n'affame pas les autres).
+    """
+
+    def __init__(
+        self,
+        pairs: Iterable[Tuple[str, int]],
+        collector: Any,
+        cap: int,
+        timeout: _AdaptiveTimeout,
+        accept: Tuple[str, ...] = ("open",),
+        name: str = "",
+        governor: Optional[_RateGovernor] = None,
+        port_timeouts: Optional[Dict[int, float]] = None,
+    ):
+        self.pairs = iter(pairs)
+        self.collector = collector
+        self.cap = max(1, cap)
+        self.timeout = timeout
+        self.accept = accept
+        self.name = name
+        self.governor = governor
+        self.port_timeouts = port_timeouts or {}
+        self.inflight = 0
+
+    def timeout_for(self, port: int) -> float:
+        # Timeout propre au port (profil) sauf si le timeout adaptatif mesuré prend la main
+        t = self.port_timeouts.get(port)
+        return t if t is not None and not self.timeout.adaptive else self.timeout.value
+
+    def done(self, host: str, port: int, result: Tuple[str, float]) -> None:
+        state, rtt_s = result
+        self.timeout.observe(state, rtt_s)
+        if self.governor is not None:
+            self.governor.record(state)
+        self.collector.add(host, port, state in self.accept)
+
+
+def _fd_budget(wanted: int, reserve: int = 64) -> int:
+    """
+    Borne la concurrence asyncio par la limite de descripteurs (RLIMIT_NOFILE) :
+    chaque connexion en vol consomme un fd.
+    """
+    try:
+        import resource
+
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            return max(1, min(wanted, soft - reserve))
+    except Exception:
+        pass
+    return max(1, wanted)
+
+
+# Règles d'OS par ordre de précédence : la 1re qui matche l'emporte
+_OS_RULES = (
+    ((3389, 445, 139), "windows"),
+    ((53, 389), "windows-server (dc/dns probable)"),
+    ((22,), "linux"),
+)
+
+
+def _guess_os_from_ports(open_ports: List[int]) -> str:
+    # Heuristique simple (demande: "essayer de déterminer l’OS")
+    for rule_ports, guess in _OS_RULES:
+        if any(p in open_ports for p in rule_ports):
+            return guess
+    return "unknown"
+
+
+def _os_guess_final(open_ports: List[int], remaining: List[int]) -> bool:
+    """Vrai si aucun des ports `remaining` ne peut plus changer le résultat de _guess_os_from_ports."""
+    for rule_ports, _ in _OS_RULES:
+        if any(p in open_ports for p in rule_ports):
+            return True
+        if any(p in remaining for p in rule_ports):
+            return False
+    return False
+
+
+# ----------------------------
+# Bannières de service -> (produit, version) endoflife.date
+# ----------------------------
+def _recv_until(sock: socket.socket, marker: bytes, limit: int = 8192) -> bytes:
+    buf = b""
+    while marker not in buf and len(buf) < limit:
+        chunk = sock.recv(1024)
+        if not chunk:
+            break
+        buf += chunk
+    return buf
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            break
+        buf += chunk
+    return buf
+
+
+def _grab_banner(host: str, port: int, proto: str, timeout_s: float = 1.5) -> Optional[str]:
+    """
+    Lit l'identification annoncée par le service, sans authentification :
+    - ssh   : ligne "SSH-2.0-OpenSSH_8.9p1 ..." envoyée par le serveur
+    - mysql : version serveur du paquet de handshake (protocole 10)
+    - http / https : en-tête `Server` d'une requête HEAD (TLS non vérifié)
+    Retourne None si le service ne répond pas ou ne s'identifie pas.
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout_s) as raw:
+            raw.settimeout(timeout_s)
+            sock: Any = raw
+            if proto == "https":
+                ctx = ssl.create_default_context()
+                ctx.check_hostname = False
+                ctx.verify_mode = ssl.CERT_NONE
+                sock = ctx.wrap_socket(raw, server_hostname=host)
+
+            if proto == "ssh":
+                line = _recv_until(sock, b"\n", limit=512).split(b"\n", 1)[0]
+                text = line.decode("utf-8", "replace").strip()
+                return text if text.startswith("SSH-") else None
+
+            if proto == "mysql":
+                hdr = _recv_exact(sock, 4)
+                if len(hdr) < 4:
+                    return None
+                payload = _recv_exact(sock, min(int.from_bytes(hdr[:3], "little"), 1024))
+                if not payload or payload[0] != 10:  # 0xff = paquet d'erreur (hôte refusé...)
+                    return None
+                end = payload.find(b"\0", 1)
+                return payload[1:end if end > 0 else None].decode("utf-8", "replace") or None
+
+            if proto in ("http", "https"):
+                sock.sendall(f"HEAD / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: ntl-systoolbox\r\n\r\n".encode("ascii"))
+                head = _recv_until(sock, b"\r\n\r\n").decode("iso-8859-1", "replace")
+                for line in head.split("\r\n")[1:]:
+                    name, _, value = line.partition(":")
+                    if name.strip().lower() == "server":
+                        return value.strip() or None
+                return None
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+# (protocole, motif, produit endoflife.date) : le 1er motif qui matche l'emporte
+_BANNER_PRODUCTS = [
+    ("ssh", re.compile(r"OpenSSH[_-](\d+\.\d+)"), "openssh"),
+    ("mysql", re.compile(r"^(?:5\.5\.5-)?(\d+\.\d+(?:\.\d+)?)-MariaDB", re.I), "mariadb"),
+    ("mysql", re.compile(r"^(\d+\.\d+(?:\.\d+)?)"), "mysql"),
+    ("http", re.compile(r"Apache/(\d+\.\d+(?:\.\d+)?)"), "apache-http-server"),
+    ("http", re.compile(r"nginx/(\d+\.\d+(?:\.\d+)?)"), "nginx"),
+    ("http", re.compile(r"Microsoft-IIS/(\d+\.\d+)"), "iis"),
+]
+
+
+def _product_from_banner(proto: str, banner: str) -> Optional[Tuple[str, str]]:
+    proto = "http" if proto == "https" else proto
+    for p, rx, product in _BANNER_PRODUCTS:
+        if p != proto:
+            continue
+        m = rx.search(banner)
+        if m:
+            return product, m.group(1)
+    return None
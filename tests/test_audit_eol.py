@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+
+import ntlsystoolbox.modules.audit_obsolescence as audit
+from ntlsystoolbox.modules.audit_obsolescence import AuditObsolescenceModule
+
+
+def test_resolve_components_fetches_products_in_parallel(monkeypatch: pytest.MonkeyPatch):
+    mod = AuditObsolescenceModule(config={})
+
+    def slow_fetch(product: str):
+        time.sleep(0.2)
+        if product == "broken":
+            raise OSError("réseau")
+        return [{"cycle": "1", "eol": "2000-01-01"}], audit.EOLMeta("endoflife.date", "", "v1", cache="miss")
+
+    monkeypatch.setattr(mod.provider, "fetch_product", slow_fetch)
+    comps = [{"name": f"h{i}", "product": p, "version": "1.2"} for i, p in enumerate(["a", "b", "c", "broken", "a"])]
+
+    t0 = time.monotonic()
+    meta = {}
+    resolved = list(mod._resolve_components(comps, 180, meta, {}))
+
+    assert time.monotonic() - t0 < 0.6
+    assert [r["name"] for r in resolved] == ["h0", "h4", "h1", "h2", "h3"]
+    assert [r["support_status"] for r in resolved] == ["EOL", "EOL", "EOL", "EOL", "UNKNOWN"]
+    assert meta["broken"].api_mode == "error"
+    assert all(m.fetch_ms >= 150 for m in meta.values())
+
+
+def test_provider_reports_cache_hit_after_legacy_import(tmp_path: Path):
+    legacy = tmp_path / "eol_cache.json"
+    now = datetime.now().isoformat(timespec="seconds")
+    legacy.write_text(json.dumps({"mysql": {"data": [{"cycle": "8.0"}], "fetched_at_iso": now, "api_mode": "v1"}}), encoding="utf-8")
+
+    data, meta = audit.EOLProvider(cache_path=str(tmp_path / "eol_cache.sqlite")).fetch_product("MySQL")
+
+    assert data == [{"cycle": "8.0"}]
+    assert (meta.cache, meta.api_mode) == ("hit", "v1")
+    assert not legacy.exists() and (tmp_path / "eol_cache.json.migrated").exists()
+
+
+def test_eol_store_evicts_least_recently_read(tmp_path: Path):
+    store = audit._EOLStore(str(tmp_path / "eol_cache.sqlite"), max_bytes=300)  # ~87 octets par entrée : 3 tiennent
+    for product in ("a", "b", "c"):
+        store.put(product, {"data": [{"cycle": "1", "pad": "x" * 50}]})
+        time.sleep(0.01)
+    store.get("a")  # "a" redevient récent : "b" part en premier
+    store.put("d", {"data": [{"cycle": "1", "pad": "x" * 50}]})
+
+    assert store.products() == ["a", "c", "d"]
+
+
+def _put_many(path: str, prefix: str) -> None:
+    store = audit._EOLStore(path)
+    for i in range(25):
+        store.put(f"{prefix}{i}", {"data": [{"cycle": str(i)}]})
+
+
+def test_eol_store_concurrent_processes(tmp_path: Path):
+    import multiprocessing
+
+    path = str(tmp_path / "eol_cache.sqlite")
+    procs = [multiprocessing.Process(target=_put_many, args=(path, p)) for p in ("x", "y", "z")]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    assert len(audit._EOLStore(path).products()) == 75
+
+
+@pytest.fixture
+def eol_server():
+    """Stand-in local de endoflife.date : v1 pour mysql (ETag), v0 seulement pour nginx (Last-Modified)."""
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            seen.append((self.path, self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+            if self.path == "/api/v1/products/mysql/":
+                if self.headers.get("If-None-Match") == '"v8"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body, extra = b'[{"cycle": "8.0", "eol": "2026-04-30"}]', ("ETag", '"v8"')
+            elif self.path == "/api/nginx.json":
+                if self.headers.get("If-Modified-Since") == "Wed, 01 Jan 2025 00:00:00 GMT":
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body, extra = b'[{"cycle": "1.24", "eol": false}]', ("Last-Modified", "Wed, 01 Jan 2025 00:00:00 GMT")
+            else:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header(*extra)
+            self.end_headers()
+            self.wfile.write(body)
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", seen
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.mark.parametrize("product,url", [("mysql", "/api/v1/products/mysql/"), ("nginx", "/api/nginx.json")])
+def test_provider_revalidates_expired_entry_with_304(eol_server, tmp_path: Path, product: str, url: str):
+    base, seen = eol_server
+    cache = str(tmp_path / "eol_cache.sqlite")
+
+    data, meta = audit.EOLProvider(cache_path=cache, base_url=base).fetch_product(product)
+    assert meta.cache == "miss" and data
+
+    store = audit._EOLStore(cache)
+    store.put(product, {**store.get(product), "fetched_at_iso": "2000-01-01T00:00:00"})
+    seen.clear()
+
+    again, meta2 = audit.EOLProvider(cache_path=cache, base_url=base).fetch_product(product)
+
+    assert again == data and meta2.cache == "revalidated"
+    conditional = [h for h in seen if h[0] == url]
+    assert len(conditional) == 1 and (conditional[0][1] or conditional[0][2])
+    assert store.get(product)["fetched_at_iso"] != "2000-01-01T00:00:00"
+
+
+def test_provider_swr_serves_stale_and_refreshes_in_background(eol_server, tmp_path: Path):
+    base, seen = eol_server
+    cache = str(tmp_path / "eol_cache.sqlite")
+    store = audit._EOLStore(cache)
+    old = {"source": "endoflife.date", "fetched_at_iso": "2000-01-01T00:00:00", "api_mode": "v1", "data": [{"cycle": "5.7", "eol": "2023-10-31"}]}
+    store.put("mysql", old)
+
+    data, meta = audit.EOLProvider(cache_path=cache, base_url=base, policy="swr").fetch_product("mysql")
+
+    assert data == old["data"] and meta.cache == "stale" and meta.age_s > 86400 * 365
+    deadline = time.time() + 5
+    while store.get("mysql")["fetched_at_iso"] == old["fetched_at_iso"] and time.time() < deadline:
+        time.sleep(0.02)
+    assert store.get("mysql")["data"] == [{"cycle": "8.0", "eol": "2026-04-30"}]
+    assert any(h[0] == "/api/v1/products/mysql/" for h in seen)
+
+
+def test_provider_swr_refresh_threads_are_daemon_and_bounded(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    provider = audit.EOLProvider(cache_path=str(tmp_path / "eol_cache.sqlite"), policy="swr")
+    release = threading.Event()
+    monkeypatch.setattr(provider, "_fetch", lambda product, stale: release.wait(5))
+
+    provider._refresh_async("mysql", {})
+    assert all(t.daemon for t in provider._refresh_threads)
+    t0 = time.monotonic()
+    assert provider.wait_refreshes(0.1) == 1
+    assert time.monotonic() - t0 < 1.0
+
+    release.set()
+    assert provider.wait_refreshes(2.0) == 0
+
+
+def test_provider_offline_never_touches_network(eol_server, tmp_path: Path):
+    base, seen = eol_server
+    cache = str(tmp_path / "eol_cache.sqlite")
+    audit._EOLStore(cache).put("mysql", {"source": "endoflife.date", "fetched_at_iso": "2000-01-01T00:00:00", "api_mode": "v1", "data": [{"cycle": "8.0", "eol": "2026-04-30"}]})
+    provider = audit.EOLProvider(cache_path=cache, base_url=base, policy="offline")
+
+    data, meta = provider.fetch_product("mysql")
+    missing, meta2 = provider.fetch_product("nginx")
+
+    assert data and meta.cache == "stale" and meta.age_s is not None
+    assert missing == [] and meta2.api_mode == "offline" and meta2.cache == "absent"
+    assert seen == []
+    with pytest.raises(ValueError):
+        provider.set_policy("yolo")
+
+
+def test_eol_snapshot_roundtrip_and_lookup(tmp_path: Path):
+    path = str(tmp_path / "snap.bin")
+    entries = {f"prod{i}": {"data": [{"cycle": str(i), "eol": False}], "fetched_at_iso": "2026-01-01T00:00:00"} for i in range(200)}
+
+    info = audit._write_eol_snapshot(path, entries)
+    snap = audit._EOLSnapshot(path)
+
+    assert info["products"] == snap.count == 200 and snap.nslots >= 400
+    assert snap.get("prod137") == entries["prod137"]
+    assert snap.get("absent") is None
+    assert snap.products() == sorted(entries)
+    snap.close()
+
+    (tmp_path / "bad.bin").write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        audit._EOLSnapshot(str(tmp_path / "bad.bin"))
+
+
+def test_eol_snapshot_build_then_offline_lookup(eol_server, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    base, seen = eol_server
+    monkeypatch.setenv("NTL_EOL_BASE_URL", base)
+    monkeypatch.chdir(tmp_path)
+    csv_path = tmp_path / "components.csv"
+    csv_path.write_text("name;product;version\nsrv1;nginx;1.24.0\n", encoding="utf-8")
+
+    res = AuditObsolescenceModule({}).run_action("eol_snapshot_build", out="snap.bin", csv_path=str(csv_path), products=["mysql"])
+
+    assert res.status in ("SUCCESS", "WARNING")
+    assert {"mysql", "nginx"} <= set(audit._EOLSnapshot("snap.bin").products())
+    assert "openssh" in res.details["failed"]
+
+    seen.clear()
+    monkeypatch.setenv("NTL_EOL_BASE_URL", "http://127.0.0.1:9")
+    mod = AuditObsolescenceModule({})
+    mod.provider.store = audit._EOLStore(str(tmp_path / "empty.sqlite"))
+    out = mod.run_action("list_versions_eol", product="mysql", eol_snapshot="snap.bin", eol_policy="offline")
+
+    assert out.details["meta"]["cache"] == "snapshot"
+    assert out.details["rows"][0]["cycle"] == "8.0"
+    assert seen == []
+
+
+def test_cycle_index_longest_prefix_independent_of_order():
+    rows = [{"cycle": "1"}, {"cycle": "10"}, {"cycle": "1.2"}, {"cycle": "22.04"}, {"cycle": "10 22H2"}]
+    index = audit._CycleIndex(rows)
+
+    assert index.match("10.3")["cycle"] == "10"
+    assert index.match("1.2.7")["cycle"] == "1.2"
+    assert index.match("1.3")["cycle"] == "1"
+    assert index.match("22.04 LTS")["cycle"] == "22.04"
+    assert index.match("10 22H2")["cycle"] == "10 22H2"
+    assert index.match("2.0") is None and index.match("") is None
+    assert audit._CycleIndex(list(reversed(rows))).match("10.3")["cycle"] == "10"
+
+
+def test_resolve_components_dedupes_product_version_pairs(monkeypatch: pytest.MonkeyPatch):
+    mod = AuditObsolescenceModule(config={})
+    calls = []
+    real = audit._eol_days
+
+    def counting(eols):
+        calls.extend(eols)
+        return real(eols)
+
+    monkeypatch.setattr(audit, "_eol_days", counting)
+    monkeypatch.setattr(
+        mod.provider, "fetch_product",
+        lambda product: ([{"cycle": "10", "eol": "2000-01-01"}, {"cycle": "11", "eol": False}], audit.EOLMeta("endoflife.date", "", "v1")),
+    )
+    comps = [{"name": f"pc{i}", "product": "windows", "version": "10 22H2" if i % 3 else "11 23H2"} for i in range(3000)]
+
+    stats = {}
+    resolved = list(mod._resolve_components(comps, 180, {}, stats))
+
+    assert len(calls) == 2
+    assert stats["counts"] == {"OK": 1000, "SOON": 0, "EOL": 2000, "UNKNOWN": 0}
+    assert stats["components"] == 3000 and stats["unique_pairs"] == 2 and stats["dedupe_ratio"] == 1500.0
+    assert stats["resolve_ms"] >= 0
+    assert [r["support_status"] for r in resolved[:3]] == ["OK", "EOL", "EOL"]
+
+
+def test_iter_components_csv_streams_tuples_and_resolves_in_chunks(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    csv_path = tmp_path / "components.csv"
+    csv_path.write_text(
+        "hostname;OS;version;version_os\n"
+        "pc1;Windows;;10 22H2\n"
+        "pc2;windows;11 23H2;\n"
+        ";ubuntu;22.04;\n"
+        "pc4;;1.0;\n"
+        "pc5;windows;10 22H2;\n",
+        encoding="utf-8",
+    )
+    mod = AuditObsolescenceModule(config={})
+    rows = mod._iter_components_csv(str(csv_path))
+
+    assert not isinstance(rows, list)
+    assert list(rows) == [("pc1", "windows", "10 22H2"), ("pc2", "windows", "11 23H2"), ("(n/a)", "ubuntu", "22.04"), ("pc5", "windows", "10 22H2")]
+    with pytest.raises(FileNotFoundError):
+        mod._iter_components_csv(str(tmp_path / "absent.csv"))
+
+    fetched = []
+
+    def fetch(product):
+        fetched.append(product)
+        return [{"cycle": "10", "eol": "2000-01-01"}, {"cycle": "22.04", "eol": False}], audit.EOLMeta("endoflife.date", "", "v1")
+
+    monkeypatch.setattr(mod.provider, "fetch_product", fetch)
+    monkeypatch.setenv("NTL_CSV_CHUNK", "2")
+    read = []
+    source = (read.append(c) or c for c in mod._iter_components_csv(str(csv_path)))
+    stats = {}
+    rows = mod._resolve_components(source, 180, {}, stats)
+    first = [next(rows), next(rows)]
+    assert len(read) == 2 and not stats
+    resolved = first + list(rows)
+
+    assert sorted(fetched) == ["ubuntu", "windows"]
+    assert [r["support_status"] for r in resolved] == ["EOL", "UNKNOWN", "OK", "EOL"]
+    assert stats["chunks"] == 2 and stats["unique_pairs"] == 3 and stats["rows_per_s"] > 0
+
+
+def test_csv_report_keeps_only_aggregates_and_a_sample_in_details(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("NTL_DETAILS_SAMPLE", "2")
+    (tmp_path / "components.csv").write_text(
+        "name,product,version\n" + "".join(f"pc{i},windows,10\n" for i in range(5)), encoding="utf-8"
+    )
+    mod = AuditObsolescenceModule(config={})
+    monkeypatch.setattr(mod, "_list_versions_eol", lambda product: ([{"cycle": "10", "eol": "2000-01-01"}], audit.EOLMeta("endoflife.date", "", "v1")))
+
+    r = mod.run_action("csv_to_report", csv_path="components.csv")
+
+    assert r.status == "WARNING"
+    assert [c["name"] for c in r.details["components"]] == ["pc0", "pc1"] and r.details["components_truncated"]
+    assert r.details["resolve"]["counts"]["EOL"] == 5 and r.details["report"]["counts"]["EOL"] == 5
+    assert Path(r.artifacts["audit_report_html"]).exists()
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_eol_batch_statuses_and_horizons(monkeypatch: pytest.MonkeyPatch, use_numpy: bool):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(audit, "np", None)
+    today = date(2026, 1, 1)
+    eols = ["2025-06-01", "2026-01-20", "2026-03-15", "2026-09-01", "2030-01-01", True, False, None, "bientôt"]
+
+    days, shown = audit._eol_days(eols)
+    statuses = audit._eol_statuses(today, days, 180)
+
+    assert statuses == [audit._status_from_eol(today, e, 180)[0] for e in eols]
+    assert shown == [audit._status_from_eol(today, e, 180)[1] for e in eols]
+    weights = audit.array("q", [1, 2, 1, 1, 1, 3, 1, 1, 1])
+    assert audit._eol_horizons(today, days, weights) == {30: 6, 90: 7, 180: 7, 365: 8}
+
+
+def test_html_report_is_paginated_with_aggregates(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("NTL_REPORT_PAGE_SIZE", "2")
+    statuses = ["EOL", "OK", "SOON", "EOL", "UNKNOWN"]
+    comps = [
+        {"name": f"pc{i}</script>", "product": "windows" if i % 2 else "ubuntu", "version": "1", "eol_date": None, "support_status": st}
+        for i, st in enumerate(statuses)
+    ]
+    out = tmp_path / "audit_report_x.html"
+
+    info = AuditObsolescenceModule(config={})._generate_html_report(
+        inventory=[{"ip": "10.0.0.1", "open_ports": [22], "os_guess": "Linux"}],
+        components=(c for c in comps),
+        out_path=str(out),
+        meta_by_product={},
+        soon_days=180,
+        resolve_stats={"horizons": {30: 2, 90: 3}},
+    )
+
+    assert info["counts"] == {"OK": 1, "SOON": 1, "EOL": 2, "UNKNOWN": 1}
+    assert info["by_product"]["ubuntu"] == {"OK": 0, "SOON": 1, "EOL": 1, "UNKNOWN": 1}
+    assert [Path(p).name for p in info["pages"]] == ["page_0001.html", "page_0002.html", "page_0003.html"]
+    assert all(Path(p).exists() for p in info["pages"])
+
+    def rows_of(path):
+        html = Path(path).read_text(encoding="utf-8")
+        assert html.count("</script>") == 2
+        data = html.split("<script type='application/json' id='rows'>")[1].split("</script>")[0]
+        return json.loads(data)
+
+    index = out.read_text(encoding="utf-8")
+    assert "J+90: 3" in index and "10.0.0.1" in index and "5 composant(s) en 3 page(s)" in index
+    assert "audit_report_x_pages/page_0003.html" in index and "id='rows'" not in index
+    assert [r[0] for r in rows_of(info["pages"][0])] == ["pc0</script>", "pc1</script>"]
+    assert [r[4] for r in rows_of(info["pages"][2])] == [0]
+    first, last = (Path(p).read_text(encoding="utf-8") for p in (info["pages"][0], info["pages"][2]))
+    assert "page_0002.html" in first and "page_0004.html" not in last and "../audit_report_x.html" in last
+
+
+def test_bad_eol_policy_is_an_error_result_not_a_crash(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    mod = AuditObsolescenceModule(config={"audit": {"eol_policy": "yolo"}})
+    assert mod.run_action("list_versions_eol", product="mysql").status == "ERROR"
+
+    monkeypatch.setenv("NTL_EOL_POLICY", "nope")
+    mod = AuditObsolescenceModule(config={})
+    assert mod.provider.policy == "default"
+    assert capsys.readouterr().out == ""
+    assert mod.run_action("list_versions_eol", product="mysql").status == "ERROR"
+    with pytest.raises(ValueError):
+        audit.EOLProvider(policy="nope")
+
+
+def test_eol_policy_env_overrides_config(monkeypatch: pytest.MonkeyPatch):
+    mod = AuditObsolescenceModule(config={"audit": {"eol_policy": "default"}})
+    monkeypatch.setattr(mod, "_list_versions_eol", lambda product: ([], audit.EOLMeta("endoflife.date", "", "v1")))
+    monkeypatch.setenv("NTL_EOL_POLICY", "offline")
+
+    mod.run_action("list_versions_eol", product="mysql")
+    assert mod.provider.policy == "offline"
+    mod.run_action("list_versions_eol", product="mysql", eol_policy="swr")
+    assert mod.provider.policy == "swr"
@@ -0,0 +1,838 @@
+from __future__ import annotations
+
+import json
+import socket
+import time
+from pathlib import Path
+
+import pytest
+
+import ntlsystoolbox.modules.audit_obsolescence as audit
+import ntlsystoolbox.modules.scan_agents as agents
+import ntlsystoolbox.modules.scan_engine as engine
+from ntlsystoolbox.modules.audit_obsolescence import AuditObsolescenceModule
+
+
+@pytest.fixture
+def listener():
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(64)
+    yield srv.getsockname()[1]
+    srv.close()
+
+
+def _closed_port() -> int:
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+@pytest.mark.parametrize("engine", ["threads", "asyncio"])
+def test_scan_range_engines_same_shape(engine: str, listener: int, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener, _closed_port()))
+    mod = AuditObsolescenceModule(config={})
+
+    inv, stats = mod._scan_range("127.0.0.1/32", engine=engine)
+
+    assert inv == [{"ip": "127.0.0.1", "open_ports": [listener], "os_guess": "unknown"}]
+    assert stats["engine"] == engine
+    assert stats["found_hosts"] == 1
+    assert {"cidr", "ports_checked", "timeout_s", "workers", "duration_s"} <= set(stats)
+
+
+def test_scan_range_unknown_engine_is_error(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    mod = AuditObsolescenceModule(config={})
+
+    r = mod.run_action("scan_range", cidr="127.0.0.1/32", engine="nmap")
+    assert r.status == "ERROR"
+
+
+def test_filtered_host_costs_one_timeout(monkeypatch: pytest.MonkeyPatch):
+    def slow_probe(host: str, port: int, timeout_s: float = 0.5):
+        time.sleep(timeout_s)
+        return "filtered", timeout_s
+
+    monkeypatch.setattr(engine, "_tcp_connect", slow_probe)
+    monkeypatch.setenv("NTL_SCAN_TIMEOUT", "0.2")
+    mod = AuditObsolescenceModule(config={})
+
+    t0 = time.monotonic()
+    inv, stats = mod._scan_range("127.0.0.1/32", engine="threads")
+    assert time.monotonic() - t0 < 0.2 * len(audit.SCAN_PORTS) / 2
+    assert inv == []
+    assert stats["probes"] == len(audit.SCAN_PORTS)
+
+
+def test_discovery_prunes_before_full_sweep(listener: int, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    real_connect = engine._tcp_connect
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        if port != listener:  # sonde de liveness
+            return ("closed" if host == "127.0.0.1" else "filtered"), 0.001
+        return real_connect(host, port, timeout_s)
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    monkeypatch.setattr(audit, "_read_arp_table", lambda: ["127.0.0.2", "10.0.0.1"])
+    mod = AuditObsolescenceModule(config={})
+
+    inv, stats = mod._scan_range("127.0.0.0/29", engine="threads", discovery=True)
+
+    assert [h["ip"] for h in inv] == ["127.0.0.1"]
+    d = stats["discovery"]
+    assert d["liveness"]["candidates"] == 6
+    assert d["liveness"]["alive_arp_only"] == 1
+    assert d["liveness"]["pruned"] == 4
+    assert d["sweep"] == {"hosts": 2, "pruned": 1, "duration_s": d["sweep"]["duration_s"]}
+    assert stats["probes"] == 6 + 2
+
+
+@pytest.mark.parametrize("engine", ["threads", "asyncio"])
+def test_all_sites_merged_inventory_tagged_by_site(engine: str, listener: int, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    mod = AuditObsolescenceModule(config={"networks": {"a": "127.0.0.1/32", "b": "127.0.0.2/32", "default_scan": "10.0.0.0/24"}})
+
+    inv, stats = mod._scan_range(audit.ALL_SITES, engine=engine)
+
+    assert inv == [{"ip": "127.0.0.1", "open_ports": [listener], "os_guess": "unknown", "site": "a"}]
+    assert set(stats["sites"]) == {"a", "b"}
+    assert stats["sites"]["a"]["found_hosts"] == 1
+    assert stats["sites"]["b"]["found_hosts"] == 0
+    assert all("duration_s" in st for st in stats["sites"].values())
+
+
+def test_site_cap_bounds_each_site(monkeypatch: pytest.MonkeyPatch):
+    import threading
+
+    lock = threading.Lock()
+    inflight = {"total": 0, "127.0.1": 0, "127.0.2": 0}
+    peak = dict(inflight)
+
+    def probe(host: str, port: int, timeout_s: float = 0.5):
+        site = host.rsplit(".", 1)[0]
+        with lock:
+            for k in ("total", site):
+                inflight[k] += 1
+                peak[k] = max(peak[k], inflight[k])
+        time.sleep(0.02)
+        with lock:
+            for k in ("total", site):
+                inflight[k] -= 1
+        return "filtered", timeout_s
+
+    monkeypatch.setattr(engine, "_tcp_connect", probe)
+    monkeypatch.setenv("NTL_SCAN_WORKERS", "6")
+    monkeypatch.setenv("NTL_SCAN_SITE_CAP", "4")
+    mod = AuditObsolescenceModule(config={})
+
+    _, stats = mod._scan_range("127.0.1.0/29,127.0.2.0/29", engine="threads")
+
+    assert stats["site_cap"] == 4
+    assert peak["total"] <= 6
+    assert peak["127.0.1"] <= 4 and peak["127.0.2"] <= 4
+    assert peak["127.0.1"] >= 2 and peak["127.0.2"] >= 2
+
+
+def test_scan_range_stream_ndjson(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    mod = AuditObsolescenceModule(config={})
+
+    r = mod.run_action("scan_range", cidr="127.0.0.1/32", stream=True)
+
+    lines = Path(r.artifacts["inventory_ndjson"]).read_text(encoding="utf-8").splitlines()
+    assert [json.loads(ln)["ip"] for ln in lines] == ["127.0.0.1"]
+    assert r.details["inventory"][0]["open_ports"] == [listener]
+    assert Path(r.artifacts["inventory_json"]).exists()
+
+
+def test_read_ndjson_skips_truncated_tail(tmp_path: Path):
+    p = tmp_path / "partial.ndjson"
+    p.write_text('{"ip": "10.0.0.2", "open_ports": [22]}\n{"ip": "10.0.0.9", "open_p', encoding="utf-8")
+    assert [h["ip"] for h in engine._read_ndjson(str(p))] == ["10.0.0.2"]
+
+
+def test_since_reports_delta_against_previous_inventory(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    closed = _closed_port()
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener, closed))
+    prev = tmp_path / "inventory_prev.json"
+    prev.write_text(
+        json.dumps(
+            {
+                "stats": {},
+                "inventory": [
+                    {"ip": "127.0.0.1", "open_ports": [closed], "os_guess": "unknown"},
+                    {"ip": "127.0.0.3", "open_ports": [22], "os_guess": "linux"},
+                    {"ip": "10.9.9.9", "open_ports": [22], "os_guess": "linux"},
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    mod = AuditObsolescenceModule(config={})
+
+    inv, stats = mod._scan_range("127.0.0.0/29", engine="threads", since=str(prev), rotate=3)
+
+    delta = stats["delta"]
+    assert [h["ip"] for h in inv] == ["127.0.0.1"]
+    assert delta["previous_hosts"] == 2
+    assert delta["new_hosts"] == []
+    assert delta["vanished_hosts"] == ["127.0.0.3"]
+    assert delta["port_changes"] == [{"ip": "127.0.0.1", "opened": [listener], "closed": [closed]}]
+    rot = delta["rotation"]
+    unknown = [i for i in (2, 4, 5, 6) if (0x7F000000 + i) % 3 == rot["slice"]]
+    assert rot["slices"] == 3 and rot["swept_unknown"] == len(unknown)
+    assert stats["probes"] == 2 * (2 + len(unknown))
+
+
+def test_adaptive_timeout_from_rtt_distribution():
+    t = engine._AdaptiveTimeout(0.4, adaptive=True, k=3.0, floor_s=0.05, ceil_s=2.0, warmup=5)
+    assert t.value == 2.0  # plafond tant que le RTT n'est pas mesuré
+
+    for _ in range(4):
+        t.observe("closed", 0.010)
+    t.observe("filtered", 2.0)  # pas de réponse : pas d'échantillon
+    assert t.value == 2.0
+    t.observe("open", 0.030)
+    assert t.value == pytest.approx(0.09)
+
+    for _ in range(10):
+        t.observe("open", 0.001)
+    assert t.value == pytest.approx(0.09)  # p99 tient encore compte du 30 ms
+    assert t.to_dict()["rtt_samples"] == 15
+
+    slow = engine._AdaptiveTimeout(0.4, adaptive=True, ceil_s=2.0, warmup=1)
+    slow.observe("open", 1.5)
+    assert slow.value == 2.0
+
+
+def test_scan_range_reports_adaptive_timeout(listener: int, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener, _closed_port()))
+    mod = AuditObsolescenceModule(config={})
+
+    _, stats = mod._scan_range("127.0.0.0/29", engine="asyncio", adaptive=True)
+
+    assert stats["timeout"]["adaptive"] is True
+    assert stats["timeout"]["rtt_samples"] >= 5
+    assert stats["timeout"]["timeout_s"] < 2.0
+
+
+def test_rate_limit_paces_probes(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (_closed_port(),))
+    mod = AuditObsolescenceModule(config={})
+
+    t0 = time.monotonic()
+    _, stats = mod._scan_range("127.0.0.0/29", engine="threads", rate=20)
+
+    # 6 sondes, rafale de 2 : au moins 4 intervalles de 50 ms
+    assert time.monotonic() - t0 >= 0.18
+    assert stats["rate"]["global_pps"] == 20
+    assert stats["rate"]["throttle_s"] > 0
+
+
+def test_governor_backs_off_on_local_errors():
+    gov = engine._RateGovernor(rate_pps=None, site_rate_pps=100, window=10)
+    gov.delay("wh1")
+    for _ in range(10):
+        gov.record("error")
+
+    assert gov.backoffs == 1
+    assert gov.factor == 0.5
+    assert gov.global_bucket is not None  # limite dérivée du débit observé
+    assert gov.site_buckets["wh1"].rate_pps == 50
+
+    for _ in range(10):
+        gov.record("open")
+    assert gov.factor == pytest.approx(0.6)
+    assert gov.to_dict()["local_errors"] == 10
+
+
+def test_compact_inventory_sorts_on_ints_and_serialises():
+    inv = engine._CompactInventory([443, 22, 80], sites=["a"])
+    inv.add_dict({"ip": "10.0.0.10", "open_ports": [80, 22], "site": "b"})
+    inv.add(engine._ip_int("10.0.0.9"), inv.mask_of([443]), 0)
+
+    inv.sort()
+
+    assert list(inv.ips) == [engine._ip_int("10.0.0.9"), engine._ip_int("10.0.0.10")]
+    assert inv.to_dicts() == [
+        {"ip": "10.0.0.9", "open_ports": [443], "os_guess": "unknown", "site": "a"},
+        {"ip": "10.0.0.10", "open_ports": [22, 80], "os_guess": "linux", "site": "b"},
+    ]
+
+
+@pytest.mark.parametrize(
+    "cidr,expected",
+    [("10.0.0.0/30", ["10.0.0.1", "10.0.0.2"]), ("10.0.0.0/31", ["10.0.0.0", "10.0.0.1"]), ("10.0.0.5/32", ["10.0.0.5"])],
+)
+def test_iter_hosts_as_ints(cidr: str, expected: list):
+    import ipaddress
+
+    assert [engine._int_ip(h) for h in engine._iter_hosts(ipaddress.ip_network(cidr))] == expected
+
+
+def _serve(payload: bytes):
+    """Serveur local qui envoie `payload` à chaque connexion (après lecture si HTTP)."""
+    import threading
+
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(16)
+    srv.settimeout(0.1)
+    stop = threading.Event()
+
+    def loop() -> None:
+        while not stop.is_set():
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                continue
+            with conn:
+                conn.settimeout(0.2)
+                if payload.startswith(b"HTTP/"):
+                    try:
+                        conn.recv(1024)
+                    except OSError:
+                        continue
+                try:
+                    conn.sendall(payload)
+                except OSError:
+                    pass
+
+    t = threading.Thread(target=loop, daemon=True)
+    t.start()
+    return srv.getsockname()[1], lambda: (stop.set(), t.join(), srv.close())
+
+
+@pytest.mark.parametrize(
+    "proto,banner,expected",
+    [
+        ("ssh", "SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.1", ("openssh", "8.9")),
+        ("mysql", "8.0.35-0ubuntu0.22.04.1", ("mysql", "8.0.35")),
+        ("mysql", "5.5.5-10.6.12-MariaDB-0ubuntu0.22.04.1", ("mariadb", "10.6.12")),
+        ("https", "Apache/2.4.52 (Ubuntu)", ("apache-http-server", "2.4.52")),
+        ("http", "Microsoft-IIS/10.0", ("iis", "10.0")),
+        ("http", "cloudflare", None),
+    ],
+)
+def test_product_from_banner(proto: str, banner: str, expected):
+    assert engine._product_from_banner(proto, banner) == expected
+
+
+def test_grab_banner_mysql_and_http():
+    payload = b"\x0a8.0.35\x00" + b"\x00" * 20
+    port, stop = _serve(len(payload).to_bytes(3, "little") + b"\x00" + payload)
+    try:
+        assert engine._grab_banner("127.0.0.1", port, "mysql", 1.0) == "8.0.35"
+    finally:
+        stop()
+
+    port, stop = _serve(b"HTTP/1.1 200 OK\r\nServer: nginx/1.24.0\r\nContent-Length: 0\r\n\r\n")
+    try:
+        assert engine._grab_banner("127.0.0.1", port, "http", 1.0) == "nginx/1.24.0"
+    finally:
+        stop()
+
+
+def test_scan_banners_resolve_eol_without_csv(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    port, stop = _serve(b"SSH-2.0-OpenSSH_7.4\r\n")
+    monkeypatch.setattr(audit, "SCAN_PORTS", (port,))
+    monkeypatch.setattr(audit, "BANNER_PORTS", {port: "ssh"})
+    mod = AuditObsolescenceModule(config={})
+    cycles = [{"cycle": "9.6", "eol": False}, {"cycle": "7.4", "eol": "2019-01-01"}]
+    monkeypatch.setattr(mod.provider, "fetch_product", lambda product: (cycles, audit.EOLMeta("test", "", "v1")))
+
+    try:
+        r = mod.run_action("scan_range", cidr="127.0.0.1/32", banners=True)
+    finally:
+        stop()
+
+    host = r.details["inventory"][0]
+    assert host["services"] == [{"port": port, "banner": "SSH-2.0-OpenSSH_7.4", "product": "openssh", "version": "7.4"}]
+    assert r.details["stats"]["banners"]["identified"] == 1
+    assert r.details["components"] == [
+        {"name": f"127.0.0.1:{port}", "product": "openssh", "version": "7.4", "eol_date": "2019-01-01", "support_status": "EOL"}
+    ]
+    assert r.status == "WARNING"
+
+
+def test_block_tracker_marks_blocks_once_passed_and_finished():
+    t = engine._BlockTracker(4)
+    it = t.feed(range(1, 10))  # blocs 0: 1-3, 1: 4-7, 2: 8-9
+    emitted = [next(it) for _ in range(5)]
+    for ip in emitted[:3]:
+        t.finish(ip)
+    assert t.done == {0}
+    t.finish(4)
+    assert t.done == {0}  # bloc 1 encore en cours d'énumération
+    rest = list(it)
+    for ip in [5, 6, 7] + rest:
+        t.finish(ip)
+    assert t.done == {0, 1, 2}
+
+    again = engine._BlockTracker(4, done={0, 2})
+    assert list(again.feed(range(1, 10))) == [4, 5, 6, 7]
+    assert again.skipped == 5
+
+
+def test_interrupted_scan_resumes_from_checkpoint(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    monkeypatch.setenv("NTL_SCAN_WORKERS", "1")
+    monkeypatch.setenv("NTL_SCAN_BLOCK", "8")
+    real_connect = engine._tcp_connect
+    calls = []
+    interrupt = ["127.0.0.20"]
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        calls.append(host)
+        if host in interrupt:
+            interrupt.clear()
+            raise KeyboardInterrupt
+        return real_connect(host, port, timeout_s) if host == "127.0.0.1" else ("closed", 0.001)
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    mod = AuditObsolescenceModule(config={})
+    cp = tmp_path / "scan.checkpoint.json"
+
+    with pytest.raises(KeyboardInterrupt):
+        mod._scan_range("127.0.0.0/27", engine="threads", checkpoint_path=str(cp))
+
+    saved = json.loads(cp.read_text(encoding="utf-8"))
+    assert len(saved["done"]["127.0.0.0/27"]) == 2  # .1-.7 et .8-.15 ; .16-.23 partiel
+    assert [h["ip"] for h in saved["inventory"]] == ["127.0.0.1"]
+
+    calls.clear()
+    inv, stats = mod._scan_range("127.0.0.0/27", engine="threads", resume=str(cp))
+
+    assert [h["ip"] for h in inv] == ["127.0.0.1"]
+    assert calls[0] == "127.0.0.16" and len(calls) == 15
+    assert stats["checkpoint"]["resumed_blocks"] == 2
+    assert stats["checkpoint"]["skipped_hosts"] == 15
+    assert not cp.exists()
+
+
+
+def test_resume_with_discovery_skips_finished_blocks(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    monkeypatch.setenv("NTL_SCAN_WORKERS", "1")
+    monkeypatch.setenv("NTL_SCAN_BLOCK", "8")
+    monkeypatch.setenv("NTL_SCAN_LIVENESS_PORT", str(listener))
+    calls = []
+    interrupt = ["127.0.0.20"]
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        calls.append(host)
+        if host in interrupt:
+            interrupt.clear()
+            raise KeyboardInterrupt
+        return ("open", 0.001) if host == "127.0.0.1" else ("closed", 0.001)
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    mod = AuditObsolescenceModule(config={})
+    cp = tmp_path / "scan.checkpoint.json"
+    with pytest.raises(KeyboardInterrupt):
+        mod._scan_range("127.0.0.0/27", engine="threads", checkpoint_path=str(cp))
+
+    calls.clear()
+    inv, stats = mod._scan_range("127.0.0.0/27", engine="threads", resume=str(cp), discovery=True)
+
+    assert [h["ip"] for h in inv] == ["127.0.0.1"]
+    assert calls and all(int(h.rsplit(".", 1)[1]) >= 16 for h in calls)
+    assert stats["discovery"]["liveness"]["candidates"] == 15
+
+
+def test_discovery_interrupt_saves_empty_blocks(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    monkeypatch.setattr(audit, "_read_arp_table", lambda: [])
+    monkeypatch.setenv("NTL_SCAN_WORKERS", "1")
+    monkeypatch.setenv("NTL_SCAN_BLOCK", "8")
+    calls = []
+    interrupt = ["127.0.0.20"]
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        calls.append(host)
+        if host in interrupt:
+            interrupt.clear()
+            raise KeyboardInterrupt
+        return ("open", 0.001) if host == "127.0.0.1" else ("filtered", 0.001)
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    mod = AuditObsolescenceModule(config={})
+    cp = tmp_path / "scan.checkpoint.json"
+    with pytest.raises(KeyboardInterrupt):
+        mod._scan_range("127.0.0.0/27", engine="threads", checkpoint_path=str(cp), discovery=True)
+
+    # Interrompu pendant la découverte : checkpoint écrit, bloc 8-15 (sondé, vide) terminé
+    assert json.loads(cp.read_text(encoding="utf-8"))["done"] == {"127.0.0.0/27": [engine._ip_int("127.0.0.8") // 8]}
+    calls.clear()
+    inv, stats = mod._scan_range("127.0.0.0/27", engine="threads", resume=str(cp), discovery=True)
+
+    assert [h["ip"] for h in inv] == ["127.0.0.1"]
+    assert not [h for h in calls if 8 <= int(h.rsplit(".", 1)[1]) < 16]
+    assert stats["discovery"]["liveness"]["candidates"] == 7 + 15
+
+
+@pytest.mark.parametrize("engine", ["threads", "asyncio"])
+def test_sharded_scan_merges_into_single_inventory(engine: str, listener: int, monkeypatch: pytest.MonkeyPatch):
+    import os
+
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener, _closed_port()))
+    mod = AuditObsolescenceModule(config={"networks": {"a": "127.0.0.0/29", "b": "127.0.1.0/30"}})
+
+    single, _ = mod._scan_range("a,b", engine=engine)
+    inv, stats = mod._scan_range("a,b", engine=engine, shards=3)
+
+    assert inv == single
+    shards = stats["shards"]
+    assert [s["index"] for s in shards] == [0, 1, 2]
+    assert sum(s["hosts"] for s in shards) == 6 + 2
+    assert all(s["pid"] != os.getpid() and "duration_s" in s for s in shards)
+    assert stats["probes"] == 8 * 2
+    assert stats["sites"]["a"]["found_hosts"] == 1
+
+
+
+def test_sharded_scan_with_stream_counts_each_shard_once(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (22,))
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        # dernier hôte de chaque tranche lent : les deux tranches ont écrit avant de relire le flux
+        if host in ("127.0.0.7", "127.0.0.14"):
+            time.sleep(0.4)
+        return ("open", 0.001) if host in ("127.0.0.1", "127.0.0.9") else ("closed", 0.001)
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    stream = tmp_path / "inventory.ndjson"
+    mod = AuditObsolescenceModule(config={})
+
+    inv, stats = mod._scan_range("127.0.0.0/28", engine="threads", shards=2, stream_path=str(stream))
+
+    assert [h["ip"] for h in inv] == ["127.0.0.1", "127.0.0.9"]
+    assert [s["hosts"] for s in stats["shards"]] == [7, 7]
+    assert [s["found_hosts"] for s in stats["shards"]] == [1, 1]
+    assert len(stream.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_sharded_scan_rejects_checkpoint(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    mod = AuditObsolescenceModule(config={})
+    with pytest.raises(ValueError):
+        mod._scan_range("127.0.0.0/29", shards=2, checkpoint_path=str(tmp_path / "cp.json"))
+
+
+def test_scan_profile_priority_order_and_config_override():
+    mod = AuditObsolescenceModule(
+        config={"audit": {"scan_profiles": {"web": {"ports": [8080, {"port": 443, "timeout": 0.2}, {"port": 9000, "priority": 99}]}}}}
+    )
+
+    name, ports, timeouts, early = mod._scan_profile("default")
+    assert (name, ports[:2], early) == ("default", [3389, 445], False)
+    assert sorted(ports) == sorted(audit.SCAN_PORTS)
+    assert len(mod._scan_profile("deep")[1]) == 100
+
+    assert mod._scan_profile("web")[1:3] == ([9000, 443, 8080], {443: 0.2})
+    with pytest.raises(ValueError):
+        mod._scan_profile("nope")
+
+
+def test_early_os_skips_ports_once_guess_is_final(monkeypatch: pytest.MonkeyPatch):
+    sent = []
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        sent.append((host, port, timeout_s))
+        return ("open" if port == 445 else "closed"), 0.001
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    monkeypatch.setenv("NTL_SCAN_WORKERS", "1")
+    mod = AuditObsolescenceModule(
+        config={"audit": {"scan_profiles": {"quick": {"early_os": True, "ports": [22, {"port": 445, "timeout": 0.1}, 80]}}}}
+    )
+
+    inv, stats = mod._scan_range("127.0.0.0/30", engine="threads", profile="quick")
+
+    assert [h["os_guess"] for h in inv] == ["windows", "windows"]
+    assert all(h["open_ports"] == [445] for h in inv)
+    assert [(p, t) for _, p, t in sent[:1]] == [(445, 0.1)]  # 445 passe en tête et garde son timeout
+    assert stats["probes"] == 2 and stats["profile"]["early_skipped"] == 4
+
+
+def test_distributed_scan_with_local_agents(listener: int, monkeypatch: pytest.MonkeyPatch):
+    import threading
+
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener, _closed_port()))
+    monkeypatch.setenv("NTL_SCAN_AGENT_WAIT", "10")
+    monkeypatch.setenv("NTL_SCAN_AGENT_TOKEN", "s3cret")
+    mod = AuditObsolescenceModule(config={"networks": {"a": "127.0.0.0/29", "b": "127.0.1.0/30"}})
+    single, _ = mod._scan_range("a,b", engine="threads")
+    port = _closed_port()
+
+    def flaky_agent() -> None:
+        # Prend une tranche puis se déconnecte sans résultat : elle doit être redistribuée
+        for _ in range(50):
+            try:
+                s = socket.create_connection(("127.0.0.1", port))
+                break
+            except OSError:
+                time.sleep(0.05)
+        f = s.makefile("rwb")
+        agents._send_msg(f, {"type": "hello", "agent": "flaky", "token": "s3cret"})
+        agents._send_msg(f, {"type": "next"})
+        job = agents._recv_msg(f)
+        agents._send_msg(f, {"type": "host", "job": job["job"], "item": {"ip": "10.9.9.9", "open_ports": [listener]}})
+        f.close()
+        s.close()
+
+    out = {}
+    controller = threading.Thread(
+        target=lambda: out.update(zip(("inv", "stats"), mod._scan_range("a,b", engine="threads", agents=f"127.0.0.1:{port}", jobs=4)))
+    )
+    controller.start()
+    flaky_agent()
+    results = []
+    workers = [
+        threading.Thread(
+            target=lambda n=n, site=site: results.append(
+                agents._run_scan_agent(f"127.0.0.1:{port}", n, token="s3cret", wait_s=5, sites=[site])
+            )
+        )
+        for n, site in (("ag1", "a"), ("ag2", "b"))
+    ]
+    for t in workers:
+        t.start()
+    for t in workers + [controller]:
+        t.join()
+    inv, stats = out["inv"], out["stats"]
+
+    assert inv == single
+    assert stats["agents"]["requeued"] == 1
+    assert stats["agents"]["by_agent"] == {"ag1": 4, "ag2": 4}
+    # Affinité : chaque agent ne reçoit que les tranches de son site
+    assert {(s["site"], s["agent"]) for s in stats["shards"]} == {("a", "ag1"), ("b", "ag2")}
+    assert sorted(s["index"] for s in stats["shards"] if s["site"] == "a") == [0, 1, 2, 3]
+    assert sum(s["hosts"] for s in stats["shards"]) == 8
+    assert {site: st["found_hosts"] for site, st in stats["sites"].items()} == {"a": 1, "b": 0}
+    assert sum(r["jobs"] for r in results) == 8
+
+
+def test_controller_rejects_bad_token(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("NTL_SCAN_AGENT_TOKEN", "good")
+    ctl = agents._AgentController("127.0.0.1:0", ["127.0.0.1/32"], 1, {}, {}, token="good")
+    try:
+        import threading
+
+        threading.Thread(target=ctl._accept_loop, daemon=True).start()
+        with pytest.raises(ValueError):
+            agents._run_scan_agent(f"127.0.0.1:{ctl.address[1]}", "intrus", token="bad", wait_s=1)
+        assert ctl.rejected == 1
+    finally:
+        ctl.close()
+
+
+
+def test_controller_requeues_silent_and_malformed_agents(listener: int, monkeypatch: pytest.MonkeyPatch):
+    import threading
+
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    ctl = agents._AgentController("127.0.0.1:0", ["127.0.0.1/32"], 1, {}, {"engine": "threads"}, heartbeat_s=0.1)
+    out = {}
+    server = threading.Thread(target=lambda: out.update(parts=ctl.serve(5)))
+    server.start()
+
+    def rogue(after_job) -> socket.socket:
+        s = socket.create_connection(ctl.address)
+        f = s.makefile("rwb")
+        agents._send_msg(f, {"type": "hello", "agent": "rogue"})
+        agents._send_msg(f, {"type": "next"})
+        job = agents._recv_msg(f)
+        after_job(f, job["job"])
+        return s
+
+    try:
+        # Agent muet sur un lien à moitié ouvert : coupé après 4 x heartbeat, tranche redonnée
+        silent = rogue(lambda f, job: None)
+        time.sleep(0.6)
+        # Résultat mal formé : rejeté sans KeyError, tranche redonnée
+        rogue(lambda f, job: agents._send_msg(f, {"type": "result", "job": job, "stats": {"probes": "x"}})).close()
+        res = agents._run_scan_agent(f"127.0.0.1:{ctl.address[1]}", "a1", wait_s=5, heartbeat_s=0.1)
+        server.join(5)
+        silent.close()
+    finally:
+        ctl.close()
+
+    assert ctl.requeued == 2 and res["jobs"] == 1
+    assert [h["ip"] for h in out["parts"][0][0]] == ["127.0.0.1"]
+    with pytest.raises(ValueError):
+        agents._check_host({"ip": "127.0.0.1", "open_ports": ["22"]})
+
+
+def test_agent_ignores_path_options_from_controller(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    import threading
+
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    victim = tmp_path / "victim.txt"
+    victim.write_text("keep", encoding="utf-8")
+    rogue_opts = {
+        "engine": "threads",
+        "checkpoint_path": str(victim),
+        "cache_path": str(tmp_path / "cache.json"),
+        "stream_path": str(tmp_path / "stream.ndjson"),
+    }
+    ctl = agents._AgentController("127.0.0.1:0", ["127.0.0.1/32"], 1, {"audit": {"components_csv": "/etc/passwd"}}, rogue_opts)
+    out = {}
+    server = threading.Thread(target=lambda: out.update(parts=ctl.serve(5)))
+    server.start()
+    try:
+        res = agents._run_scan_agent(f"127.0.0.1:{ctl.address[1]}", "a1", wait_s=5)
+        server.join(5)
+    finally:
+        ctl.close()
+
+    assert res["jobs"] == 1 and [h["ip"] for h in out["parts"][0][0]] == ["127.0.0.1"]
+    assert victim.read_text(encoding="utf-8") == "keep"
+    assert not (tmp_path / "cache.json").exists() and not (tmp_path / "stream.ndjson").exists()
+    assert agents._agent_config({"networks": {"a": "10.0.0.0/24"}, "audit": {"components_csv": "x", "scan_profile": "fast"}}) == {
+        "networks": {"a": "10.0.0.0/24"},
+        "audit": {"scan_profile": "fast"},
+    }
+
+
+def test_scan_cache_skips_fresh_hosts_and_refresh_bypasses(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener, _closed_port()))
+    mod = AuditObsolescenceModule(config={})
+
+    first = mod.run_action("scan_range", cidr="127.0.0.0/30")
+    again = mod.run_action("scan_range", cidr="127.0.0.0/30")
+    forced = mod.run_action("scan_range", cidr="127.0.0.0/30", refresh=True)
+
+    assert first.details["stats"]["cache"]["misses"] == 2 and first.details["stats"]["probes"] == 4
+    st = again.details["stats"]
+    assert (st["cache"]["hits"], st["probes"]) == (2, 0)
+    assert again.details["inventory"] == first.details["inventory"]
+    assert (forced.details["stats"]["cache"]["hits"], forced.details["stats"]["probes"]) == (0, 4)
+    assert Path("reports/audit/scan_cache.json").exists()
+
+
+def test_discovery_skips_liveness_for_cached_hosts(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    real_connect = engine._tcp_connect
+    liveness = []
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        if port != listener:  # sonde de liveness
+            liveness.append(host)
+            return ("closed" if host == "127.0.0.1" else "filtered"), 0.001
+        return real_connect(host, port, timeout_s)
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    monkeypatch.setattr(audit, "_read_arp_table", lambda: [])
+    mod = AuditObsolescenceModule(config={})
+    cache = str(tmp_path / "scan_cache.json")
+
+    first, _ = mod._scan_range("127.0.0.0/29", engine="threads", discovery=True, cache_path=cache)
+    liveness.clear()
+    again, stats = mod._scan_range("127.0.0.0/29", engine="threads", discovery=True, cache_path=cache)
+
+    assert "127.0.0.1" not in liveness and len(liveness) == 5
+    assert again == first and [h["ip"] for h in again] == ["127.0.0.1"]
+    assert stats["discovery"]["liveness"]["cached"] == 1 and stats["cache"]["hits"] == 1
+    assert stats["probes"] == 5
+
+
+def test_scan_cache_ttl_ports_and_lru(tmp_path: Path):
+    path = str(tmp_path / "scan_cache.json")
+    c = engine._ScanCache(path, ttl_s=60, max_entries=2, ports=[22, 80])
+    for n, ports in ((1, [22]), (2, []), (3, [80])):
+        c.put(n, ports)
+    assert c.evicted == 1 and c.get(1) is None and c.get(2) == []
+    c.save()
+
+    assert engine._ScanCache(path, ttl_s=60, max_entries=2, ports=[22, 80]).get(3) == [80]
+    assert engine._ScanCache(path, ttl_s=60, max_entries=2, ports=[22, 443]).get(3) is None  # autres ports
+    assert engine._ScanCache(path, ttl_s=-1, max_entries=2, ports=[22, 80]).get(3) is None  # expiré
+
+
+def test_run_action_scan_sets_cache_and_checkpoint_by_default(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    mod = AuditObsolescenceModule(config={})
+
+    r = mod.run_action("scan_range", cidr="127.0.0.1/32")
+
+    assert "cache" in r.details["stats"] and "checkpoint" in r.details["stats"]
+
+
+def test_run_action_resume_updates_and_removes_the_resumed_checkpoint(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    monkeypatch.setenv("NTL_SCAN_WORKERS", "1")
+    monkeypatch.setenv("NTL_SCAN_BLOCK", "4")
+    real_connect = engine._tcp_connect
+    interrupt = ["127.0.0.6"]
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        if host in interrupt:
+            interrupt.clear()
+            raise KeyboardInterrupt
+        return real_connect(host, port, timeout_s)
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    mod = AuditObsolescenceModule(config={})
+    with pytest.raises(KeyboardInterrupt):
+        mod.run_action("scan_range", cidr="127.0.0.0/29")
+    (cp,) = (tmp_path / "reports" / "audit").glob("*.checkpoint.json")
+
+    r = mod.run_action("scan_range", cidr="127.0.0.0/29", resume=str(cp))
+
+    assert r.status == "SUCCESS" and r.details["stats"]["checkpoint"]["path"] == str(cp)
+    assert not list((tmp_path / "reports" / "audit").glob("*.checkpoint.json"))
+
+
+def test_csv_report_scan_errors_are_error_results(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "components.csv").write_text("name,product,version\nsrv,mysql,8.0\n", encoding="utf-8")
+    mod = AuditObsolescenceModule(config={})
+
+    for kwargs in ({"cidr": "127.0.0.1/32", "profile": "nope"}, {"cidr": "::1/128"}):
+        r = mod.run_action("csv_to_report", csv_path="components.csv", do_scan=True, **kwargs)
+        assert r.status == "ERROR" and r.details["cidr"] == kwargs["cidr"]
+
+
+def test_csv_report_scan_uses_host_cache(listener: int, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audit, "SCAN_PORTS", (listener,))
+    (tmp_path / "components.csv").write_text("name,product,version\nsrv,mysql,8.0\n", encoding="utf-8")
+    mod = AuditObsolescenceModule(config={})
+    monkeypatch.setattr(mod, "_list_versions_eol", lambda product: ([], audit.EOLMeta("endoflife.date", "", "v1")))
+
+    first = mod.run_action("csv_to_report", csv_path="components.csv", do_scan=True, cidr="127.0.0.0/30")
+    again = mod.run_action("csv_to_report", csv_path="components.csv", do_scan=True, cidr="127.0.0.0/30")
+    forced = mod.run_action("csv_to_report", csv_path="components.csv", do_scan=True, cidr="127.0.0.0/30", refresh=True)
+
+    assert first.details["scan"]["stats"]["probes"] == 2
+    assert (again.details["scan"]["stats"]["cache"]["hits"], again.details["scan"]["stats"]["probes"]) == (2, 0)
+    assert forced.details["scan"]["stats"]["probes"] == 2
+
+
+def test_early_os_hosts_are_cached(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    sent = []
+
+    def connect(host: str, port: int, timeout_s: float = 0.5):
+        sent.append(port)
+        return ("open" if port == 445 else "closed"), 0.001
+
+    monkeypatch.setattr(engine, "_tcp_connect", connect)
+    monkeypatch.setenv("NTL_SCAN_WORKERS", "1")
+    cache = str(tmp_path / "scan_cache.json")
+    mod = AuditObsolescenceModule(config={})
+
+    first, _ = mod._scan_range("127.0.0.0/30", engine="threads", profile="fast", cache_path=cache)
+    sent.clear()
+    again, stats = mod._scan_range("127.0.0.0/30", engine="threads", profile="fast", cache_path=cache)
+
+    assert [h["os_guess"] for h in first] == ["windows", "windows"]
+    assert again == first and sent == [] and stats["cache"]["hits"] == 2
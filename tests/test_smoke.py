@@ -43,7 +43,7 @@ def test_audit_run_action_scan_range(monkeypatch: pytest.MonkeyPatch, tmp_path:
 
     mod = AuditObsolescenceModule(config={})
 
-    def fake_scan(cidr: str):
+    def fake_scan(cidr: str, **kwargs):
         inv = [{"ip": "192.168.10.21", "open_ports": [22, 3306], "os_guess": "linux"}]
         stats = {"cidr": cidr, "found_hosts": 1, "ports_checked": [22], "timeout_s": 0.1, "workers": 1}
         return inv, stats